@@ -5,20 +5,28 @@ import numpy as np
 import plotly.graph_objs as go
 import plotly.express as px
 from datetime import datetime, timedelta
-import time
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import json
-import os
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.pipeline import make_pipeline
 import pytz
 import warnings
 import random
-from requests.exceptions import HTTPError, ConnectionError
 import urllib3
+from bar_store import BarStore, INTRADAY_INTERVALS
+from metadata_cache import MetadataCache
+from rate_limiter import yahoo_limiter, is_rate_limit_error
+from market_calendar import xetra_market_status, is_market_open, poll_interval, cache_max_age
+from charts import build_price_figure, OVERLAY_STYLES, DEFAULT_OVERLAYS
+from indicators import IndicatorEngine
+from portfolio import empty_positions, add_position, positions_from_records, value_positions, portfolio_totals
+from fx import FxRates, FALLBACK_RATES, FX_PAIRS
+from alert_daemon import DAEMON_STALE_AFTER
+from alert_store import AlertStore, owner_key
+from alerts import DEFAULT_COOLDOWN, DEFAULT_HYSTERESIS_PCT, AlertIndex, AlertTracker, alert_email
+from backtest import FEATURE_RIDGE_GRID, cross_validate, params_label, walk_forward
+from forecasting import batch_forecast, data_hash, prediction_inputs
+from features import BENCHMARK_SYMBOL, FeatureStore, information_coefficients
+from exports import EXPORT_FORMATS, export_history, write_archive
+from notifications import EmailDispatcher
+from online_model import OnlineModelStore
+from market_data import fetch_snapshot, fetch_panel, fetch_history, fetch_many, iter_fetch, SingleFlightCache, SNAPSHOT_COLUMNS
 warnings.filterwarnings('ignore')
 
 # Désactiver les warnings SSL
@@ -151,8 +159,16 @@ st.markdown("""
 if 'price_alerts' not in st.session_state:
     st.session_state.price_alerts = []
 
+# Incrémenté à chaque modification des alertes (reconstruction de l'index)
+if 'alerts_version' not in st.session_state:
+    st.session_state.alerts_version = 0
+
+# États armé/déclenché des alertes (notification sur front, hystérésis, délai de carence)
+if 'alert_tracker' not in st.session_state:
+    st.session_state.alert_tracker = AlertTracker()
+
 if 'portfolio' not in st.session_state:
-    st.session_state.portfolio = {}
+    st.session_state.portfolio = empty_positions()
 
 if 'watchlist' not in st.session_state:
     st.session_state.watchlist = [
@@ -202,7 +218,8 @@ if 'email_config' not in st.session_state:
         'smtp_server': 'smtp.gmail.com',
         'smtp_port': 587,
         'email': '',
-        'password': ''
+        'password': '',
+        'digest_window': 0
     }
 
 if 'demo_mode' not in st.session_state:
@@ -223,20 +240,27 @@ GERMAN_EXCHANGES = {
     '': 'US Listed (ADR)'
 }
 
-# Jours fériés allemands 2024
-GERMAN_HOLIDAYS_2024 = [
-    '2024-01-01',  # New Year's Day
-    '2024-03-29',  # Good Friday
-    '2024-04-01',  # Easter Monday
-    '2024-05-01',  # Labour Day
-    '2024-05-09',  # Ascension Day
-    '2024-05-20',  # Whit Monday
-    '2024-10-03',  # German Unity Day
-    '2024-12-24',  # Christmas Eve (half day)
-    '2024-12-25',  # Christmas Day
-    '2024-12-26',  # Boxing Day
-    '2024-12-31',  # New Year's Eve (half day)
-]
+# Moteur de requêtes concurrentes: nombre de threads et délai maximal par symbole (s)
+FETCH_MAX_WORKERS = 8
+FETCH_TIMEOUT = 10
+
+# Délai par symbole pour l'export groupé (historiques longs, file d'attente du limiteur)
+BULK_EXPORT_TIMEOUT = 60
+
+# Univers proposés à l'export groupé (None: liste de suivi de la session)
+EXPORT_UNIVERSES = {
+    'Liste de suivi': None,
+    'Indices allemands': ['^GDAXI', '^MDAXI', '^SDAXI', '^TECDAX', '^HDAXI'],
+}
+
+# Attente maximale d'un jeton du limiteur Yahoo avant de basculer sur le cache (s)
+RATE_LIMIT_WAIT = 5
+
+# Durée de vie en séance du tableau de comparaison des indices (s); allongée marché fermé
+INDEX_PANEL_TTL = 300
+
+# Durée de vie maximale d'un tableau de cotations incomplet (symboles en échec), quelle que soit l'heure (s)
+SNAPSHOT_RETRY_TTL = 60
 
 # Données de démonstration pour les principales actions allemandes
 DEMO_DATA = {
@@ -356,30 +380,134 @@ def generate_demo_history(symbol, period="1mo", interval="1d"):
     
     return df
 
+# Cache disque incrémental des historiques, partagé par toutes les sessions
+@st.cache_resource
+def get_bar_store():
+    """Renvoie le stockage local des barres OHLCV"""
+    return BarStore()
+
+# Cache longue durée des métadonnées (ticker.info), indépendant des historiques
+@st.cache_resource
+def get_metadata_cache():
+    """Renvoie le cache des informations d'entreprise partagé par toutes les sessions"""
+    return MetadataCache()
+
+# Alertes et réglages email par propriétaire, sur disque (lus aussi par alert_daemon.py)
+@st.cache_resource
+def get_alert_store():
+    """Renvoie le stockage des alertes partagé avec le démon de surveillance"""
+    return AlertStore()
+
+# Cache partagé entre sessions: une seule requête en vol par (symbole, période, intervalle)
+@st.cache_resource
+def get_shared_cache():
+    """Renvoie le cache de cotations et d'historiques commun à toutes les sessions"""
+    return SingleFlightCache()
+
+def fetch_shared_history(symbol, period='1d', interval='1d', ttl=None):
+    """Historique brut d'un symbole via le cache partagé (les requêtes simultanées sont fusionnées)
+
+    Clé distincte de celle des historiques convertis en heure de Paris ('history'):
+    les deux formats ne se remplacent jamais l'un l'autre dans le cache.
+    """
+    return get_shared_cache().get(
+        ('raw_history', symbol, period, interval),
+        lambda: fetch_history(symbol, period=period, interval=interval, timeout=FETCH_TIMEOUT),
+        ttl=ttl
+    )
+
+def download_stock_history(symbol, period, interval, wait=RATE_LIMIT_WAIT):
+    """Télécharge (via le cache disque) un historique et le convertit en heure de Paris
+
+    `wait` borne l'attente d'un jeton du limiteur de requêtes Yahoo (secondes).
+    """
+    ticker = yf.Ticker(symbol)
+    # Seules les barres postérieures au cache disque sont téléchargées
+    hist = get_bar_store().get_history(
+        symbol, period, interval,
+        lambda **kwargs: yahoo_limiter.call(
+            lambda: ticker.history(interval=interval, timeout=10, **kwargs),
+            timeout=wait
+        )
+    )
+    if hist is None or hist.empty:
+        # Exception plutôt que résultat vide: un échec n'est pas mis en cache
+        raise ValueError(f"Aucune donnée pour {symbol}")
+    
+    if hist.index.tz is None:
+        hist.index = hist.index.tz_localize('UTC').tz_convert(USER_TIMEZONE)
+    else:
+        hist.index = hist.index.tz_convert(USER_TIMEZONE)
+    return hist
+
+# Taux de change en direct, mis en cache pour toutes les sessions
+@st.cache_resource
+def get_fx_rates():
+    """Renvoie le cache des taux de change EUR -> devise"""
+    return FxRates()
+
+# Moteur d'indicateurs techniques (résultats mémorisés par symbole/période/intervalle)
+@st.cache_resource
+def get_indicator_engine():
+    """Renvoie le moteur d'indicateurs partagé par toutes les sessions"""
+    return IndicatorEngine()
+
+# Choix du modèle de prédiction par validation croisée, recalculé seulement si les données changent
+@st.cache_data(show_spinner="Validation croisée des modèles...", max_entries=64)
+def select_prediction_model(symbol, period, interval, version, _hist):
+    """Validation croisée des modèles candidats, mémorisée par version des données"""
+    return cross_validate(_hist)
+
+# Modèles de tendance mis à jour barre par barre, conservés entre les reruns et les redémarrages
+@st.cache_resource
+def get_online_models():
+    """Renvoie les modèles de prédiction tenus à jour en ligne (persistés sur disque)"""
+    return OnlineModelStore()
+
+# Variables explicatives (page ML, backtest et prévisions groupées), étendues aux nouvelles barres
+@st.cache_resource
+def get_feature_store():
+    """Renvoie le stockage des variables explicatives partagé par toutes les sessions"""
+    return FeatureStore()
+
+def load_benchmark_history(period, interval):
+    """Historique de l'indice de référence des variables relatives (None si indisponible)"""
+    if st.session_state.demo_mode:
+        return generate_demo_history(BENCHMARK_SYMBOL, period, interval)
+    try:
+        return get_shared_cache().get(
+            ('history', BENCHMARK_SYMBOL, period, interval),
+            lambda: download_stock_history(BENCHMARK_SYMBOL, period, interval),
+            ttl=600
+        )
+    except Exception:
+        return None
+
 # Fonction pour charger les données avec gestion des erreurs améliorée
 @st.cache_data(ttl=600)
 def load_stock_data(symbol, period, interval, retry_count=3):
-    """Charge les données boursières avec gestion des erreurs et retry"""
+    """Charge les données boursières avec gestion des erreurs et retry
+    
+    En mode réel, info vaut None: les métadonnées sont servies par get_metadata_cache().
+    """
     
     # Vérifier si on a des données en cache dans la session
     if st.session_state.demo_mode and symbol in DEMO_DATA:
         return generate_demo_history(symbol, period, interval), DEMO_DATA[symbol]
     
+    # Pas de pause entre les tentatives: le limiteur global cadence les requêtes
     for attempt in range(retry_count):
         try:
-            if attempt > 0:
-                time.sleep(2 ** attempt)
-            
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period, interval=interval, timeout=10)
-            info = ticker.info
+            hist = get_shared_cache().get(
+                ('history', symbol, period, interval),
+                lambda: download_stock_history(symbol, period, interval),
+                ttl=600
+            )
+            info = None
             
             if hist is not None and not hist.empty:
-                if hist.index.tz is None:
-                    hist.index = hist.index.tz_localize('UTC').tz_convert(USER_TIMEZONE)
-                else:
-                    hist.index = hist.index.tz_convert(USER_TIMEZONE)
-                
+                if hist.attrs.get('stale'):
+                    st.warning("⚠️ Yahoo Finance injoignable: dernières barres du cache disque affichées")
                 st.session_state.last_successful_data[symbol] = {
                     'hist': hist,
                     'info': info,
@@ -389,8 +517,10 @@ def load_stock_data(symbol, period, interval, retry_count=3):
                 return hist, info
             
         except Exception as e:
-            if "429" in str(e) or "Too Many Requests" in str(e):
-                st.warning(f"⚠️ Limite de requêtes atteinte. Tentative {attempt + 1}/{retry_count}...")
+            if is_rate_limit_error(e):
+                # Le limiteur a déjà réduit son débit: inutile d'insister, on sert le cache
+                st.warning("⚠️ Limite de requêtes atteinte. Utilisation des données en cache...")
+                break
             else:
                 st.warning(f"⚠️ Erreur: {e}. Tentative {attempt + 1}/{retry_count}...")
     
@@ -420,6 +550,50 @@ def load_stock_data(symbol, period, interval, retry_count=3):
     
     return generate_demo_history(symbol, period, interval), demo_info
 
+# Cotations de plusieurs symboles (requêtes parallèles), partagées entre sessions
+def load_quote_snapshot(symbols, max_age=None):
+    """Charge prix, clôture précédente et variation de plusieurs symboles en un seul tableau
+
+    Un échec (limite de requêtes, aucune cotation) renvoie un tableau vide qui n'est
+    pas mis en cache; un tableau incomplet n'est conservé que SNAPSHOT_RETRY_TTL secondes.
+    """
+    key = ('snapshot', tuple(symbols))
+    fetch_fn = lambda: download_quote_snapshot(symbols)
+    try:
+        snapshot = get_shared_cache().get(key, fetch_fn, ttl=max_age)
+        if len(snapshot) < len(set(symbols)):
+            retry_ttl = SNAPSHOT_RETRY_TTL if max_age is None else min(max_age, SNAPSHOT_RETRY_TTL)
+            snapshot = get_shared_cache().get(key, fetch_fn, ttl=retry_ttl)
+    except Exception:
+        return pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+    return snapshot
+
+def download_quote_snapshot(symbols):
+    """Télécharge le tableau de cotations (watchlist, portefeuille...)"""
+    snapshot = fetch_snapshot(list(symbols), max_workers=FETCH_MAX_WORKERS, timeout=RATE_LIMIT_WAIT)
+    if snapshot.empty:
+        # Exception plutôt que tableau vide: un échec complet n'est pas mis en cache
+        raise ValueError("Aucune cotation obtenue")
+    return snapshot
+
+# Clôtures sur 5 jours de plusieurs symboles, partagées entre sessions
+def load_index_panel(symbols, max_age=None):
+    """Charge les clôtures sur 5 jours de plusieurs symboles (requêtes parallèles)"""
+    return get_shared_cache().get(
+        ('panel', tuple(symbols), '5d'),
+        lambda: download_index_panel(symbols),
+        ttl=max_age
+    )
+
+def download_index_panel(symbols):
+    """Télécharge le panel (clôtures, erreurs); une limitation de débit Yahoo est propagée"""
+    closes, errors = fetch_panel(list(symbols), max_workers=FETCH_MAX_WORKERS, timeout=RATE_LIMIT_WAIT)
+    
+    if not closes:
+        # Exception plutôt que résultat vide: un échec complet n'est pas mis en cache
+        raise ValueError("; ".join(f"{s}: {e}" for s, e in errors.items()))
+    return closes, errors
+
 def get_exchange(symbol):
     """Détermine l'échange pour un symbole"""
     if symbol.endswith('.DE'):
@@ -476,69 +650,110 @@ def format_large_number_german(num):
     else:
         return f"{num:,.0f}"
 
+def format_money_column(values, currencies):
+    """Formate une colonne de montants selon la devise de chaque ligne (affichage seulement)"""
+    return [f"€{v:,.2f}" if c == 'EUR' else f"${v:,.2f}" for v, c in zip(values, currencies)]
+
+@st.cache_resource
+def get_email_dispatcher(smtp_server, smtp_port, email, password, digest_window):
+    """Renvoie la file d'envoi (et sa connexion SMTP) propre à ce compte email"""
+    return EmailDispatcher(smtp_server, int(smtp_port), email, password, digest_window=digest_window)
+
 def send_email_alert(subject, body, to_email):
-    """Envoie une notification par email"""
-    if not st.session_state.email_config['enabled']:
-        return False
+    """Met une notification email en file d'attente (envoi en arrière-plan)
+
+    Renvoie un Future résolu à True une fois l'email envoyé, ou None si les
+    notifications sont désactivées.
+    """
+    config = st.session_state.email_config
+    if not config['enabled']:
+        return None
     
+    dispatcher = get_email_dispatcher(
+        config['smtp_server'],
+        config['smtp_port'],
+        config['email'],
+        config['password'],
+        config.get('digest_window', 0)
+    )
+    return dispatcher.submit(subject, body, to_email)
+
+def get_alert_index():
+    """Index des alertes de la session, reconstruit seulement quand la liste change"""
+    cached = st.session_state.get('alert_index')
+    if cached is None or cached[0] != st.session_state.alerts_version:
+        cached = (st.session_state.alerts_version, AlertIndex(st.session_state.price_alerts))
+        st.session_state.alert_index = cached
+        st.session_state.alert_tracker.prune(st.session_state.price_alerts)
+    return cached[1]
+
+def auth_configured():
+    """Indique si la connexion des utilisateurs (section [auth] de secrets.toml) est configurée"""
     try:
-        msg = MIMEMultipart()
-        msg['From'] = st.session_state.email_config['email']
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html'))
-        
-        server = smtplib.SMTP(
-            st.session_state.email_config['smtp_server'], 
-            st.session_state.email_config['smtp_port']
-        )
-        server.starttls()
-        server.login(
-            st.session_state.email_config['email'],
-            st.session_state.email_config['password']
-        )
-        server.send_message(msg)
-        server.quit()
-        return True
-    except Exception as e:
-        st.error(f"Erreur d'envoi: {e}")
+        return 'auth' in st.secrets
+    except Exception:
         return False
 
-def check_price_alerts(current_price, symbol):
-    """Vérifie les alertes de prix"""
-    triggered = []
-    for alert in st.session_state.price_alerts:
-        if alert['symbol'] == symbol:
-            if alert['condition'] == 'above' and current_price >= alert['price']:
-                triggered.append(alert)
-            elif alert['condition'] == 'below' and current_price <= alert['price']:
-                triggered.append(alert)
-    
-    return triggered
+def alert_owner():
+    """Propriétaire des alertes de la session: l'email vérifié du compte connecté (None: alertes non enregistrées)
 
-def get_market_status():
-    """Détermine le statut du marché allemand (Xetra)"""
-    germany_now = datetime.now(GERMANY_TIMEZONE)
-    germany_hour = germany_now.hour
-    germany_minute = germany_now.minute
-    germany_weekday = germany_now.weekday()
-    germany_date = germany_now.strftime('%Y-%m-%d')
-    
-    # Weekend (samedi = 5, dimanche = 6)
-    if germany_weekday >= 5:
-        return "Fermé (weekend)", "🔴"
-    
-    # Jours fériés
-    if germany_date in GERMAN_HOLIDAYS_2024:
-        return "Fermé (jour férié)", "🔴"
-    
-    # Horaires Xetra: 09:00 - 17:30 CET/CEST
-    if (germany_hour > 9 or (germany_hour == 9 and germany_minute >= 0)) and germany_hour < 17:
-        return "Ouvert", "🟢"
-    elif germany_hour == 17 and germany_minute <= 30:
-        return "Ouvert", "🟢"
+    L'adresse saisie dans le formulaire email ne suffit pas: n'importe quel visiteur
+    pourrait y taper celle d'un autre et lire ou supprimer ses alertes.
+    """
+    if not st.user.get('is_logged_in') or st.user.get('email_verified') is False:
+        return None
+    return owner_key(st.user.get('email'))
+
+def _set_stored_alerts(owner, alerts, version):
+    st.session_state.price_alerts = alerts
+    st.session_state.alerts_store_version = (owner, version)
+    st.session_state.alerts_version += 1
+
+def sync_price_alerts():
+    """Recharge les alertes du propriétaire si un autre onglet ou le démon les a modifiées"""
+    owner = alert_owner()
+    if owner is None:
+        return
+    synced = st.session_state.get('alerts_store_version')
+    unsaved = [a for a in st.session_state.price_alerts if 'id' not in a]
+    if unsaved and (synced is None or synced[0] != owner):
+        # Première synchronisation après connexion: les alertes créées avant sont rattachées au compte
+        _set_stored_alerts(owner, *get_alert_store().add(owner, unsaved))
+        return
+    version = get_alert_store().version(owner)
+    if version is not None and (owner, version) != synced:
+        _set_stored_alerts(owner, *get_alert_store().load(owner))
+
+def add_price_alert(alert):
+    """Ajoute une alerte: enregistrée pour le propriétaire, sinon gardée dans la session"""
+    owner = alert_owner()
+    if owner is None:
+        st.session_state.price_alerts.append(alert)
+        st.session_state.alerts_version += 1
     else:
-        return "Fermé", "🔴"
+        _set_stored_alerts(owner, *get_alert_store().add(owner, [alert]))
+
+def remove_price_alerts(alerts):
+    """Supprime des alertes de la session et, si elles sont enregistrées, du fichier du propriétaire"""
+    owner = alert_owner()
+    if owner is None:
+        st.session_state.price_alerts = [
+            a for a in st.session_state.price_alerts if not any(a is b for b in alerts)
+        ]
+        st.session_state.alerts_version += 1
+    else:
+        _set_stored_alerts(owner, *get_alert_store().remove(owner, [a.get('id') for a in alerts]))
+
+def check_price_alerts(prices):
+    """Alertes à notifier pour ce tableau de cours {symbole: prix}
+
+    Une alerte ne notifie qu'au franchissement du seuil, puis attend d'être réarmée.
+    """
+    return st.session_state.alert_tracker.process(get_alert_index(), prices)
+
+def get_market_status():
+    """Détermine le statut du marché allemand (Xetra) à partir du calendrier calculé"""
+    return xetra_market_status(datetime.now(GERMANY_TIMEZONE))
 
 def safe_get_metric(hist, metric, index=-1):
     """Récupère une métrique en toute sécurité"""
@@ -680,6 +895,16 @@ with st.sidebar:
             step=10
         )
 
+    # Budget de requêtes Yahoo (limiteur global partagé par toutes les sessions)
+    with st.expander("📡 Budget API Yahoo"):
+        limiter_stats = yahoo_limiter.stats()
+        st.caption(f"Débit: {limiter_stats['rate']:.2f}/{limiter_stats['max_rate']:.2f} requêtes/s")
+        st.caption(f"Jetons disponibles: {limiter_stats['tokens']:.1f}/{limiter_stats['burst']}")
+        st.caption(f"File d'attente: {limiter_stats['queue_depth']} requête(s)")
+        st.caption(f"Requêtes: {limiter_stats['total_requests']} | Réponses 429: {limiter_stats['rate_limited']}")
+        cache_stats = get_shared_cache().stats()
+        st.caption(f"Cache partagé: {cache_stats['hits']} succès | {cache_stats['misses']} échecs | {cache_stats['coalesced']} fusionnées")
+
 # Chargement des données
 try:
     hist, info = load_stock_data(symbol, period, interval)
@@ -703,27 +928,165 @@ if hist is None or hist.empty:
         'marketCap': 10000000000
     })
 
+if info is None:
+    # Les métadonnées ne bloquent jamais l'affichage des prix (rafraîchies en arrière-plan)
+    info = get_metadata_cache().get(symbol) or {}
+
 current_price = safe_get_metric(hist, 'Close')
 
+# Actualisation automatique: seules les zones "live" se réexécutent (fragments Streamlit),
+# sur leur propre minuterie, sans mettre en pause le thread serveur
+# Le rythme suit le calendrier Xetra: fréquence choisie en séance, pause jusqu'à l'ouverture sinon
+# (sauf si un symbole affiché est coté hors Xetra: fréquence choisie en permanence)
+live_symbols = [symbol, *st.session_state.watchlist, *get_alert_index().symbols]
+live_refresh = poll_interval(refresh_rate, symbols=live_symbols) if auto_refresh else None
+live_market_open = is_market_open()
+
+def check_market_phase():
+    """Relance toute la page à l'ouverture/clôture pour recalculer le rythme de rafraîchissement"""
+    if live_refresh and is_market_open() != live_market_open:
+        st.rerun()
+
+def load_live_history(symbol, period, interval, max_age):
+    """Historique âgé d'au plus max_age secondes (cache partagé puis cache disque incrémental)"""
+    try:
+        return get_shared_cache().get(
+            ('history', symbol, period, interval),
+            lambda: download_stock_history(symbol, period, interval),
+            ttl=max_age
+        )
+    except Exception:
+        return None
+
+@st.fragment(run_every=live_refresh)
+def run_price_alerts(symbol, current_price):
+    """Évalue toutes les alertes (tous symboles) contre un seul tableau de cours groupé"""
+    alert_index = get_alert_index()
+    if not len(alert_index):
+        return
+    
+    if st.session_state.demo_mode:
+        prices = {s: DEMO_DATA[s]['current_price'] for s in alert_index.symbols if s in DEMO_DATA}
+    else:
+        snapshot = load_quote_snapshot(
+            tuple(alert_index.symbols),
+            max_age=cache_max_age(live_refresh or 60, symbols=alert_index.symbols)
+        )
+        prices = snapshot['price'].to_dict()
+    if symbol not in prices and current_price > 0:
+        prices[symbol] = current_price
+    
+    notifications = check_price_alerts(prices)
+    if notifications:
+        st.balloons()
+    
+    # Si le démon tourne avec un compte d'envoi, c'est lui qui notifie le propriétaire
+    # et retire les alertes à usage unique enregistrées
+    daemon = get_alert_store().daemon_status(DAEMON_STALE_AFTER)
+    daemon_running = daemon is not None and daemon.get('sender', False) and alert_owner() is not None
+    
+    for alert, price in notifications:
+        alert_symbol = alert['symbol']
+        st.success(f"🎯 Alerte déclenchée pour {alert_symbol} à {format_currency(price, alert_symbol)}")
+        if daemon_running:
+            continue
+        
+        if st.session_state.email_config['enabled']:
+            subject, body = alert_email(
+                alert, price, format_currency,
+                datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+            )
+            send_email_alert(subject, body, st.session_state.email_config['email'])
+        
+        if alert.get('one_time', False):
+            remove_price_alerts([alert])
+
 # Vérification des alertes
-triggered_alerts = check_price_alerts(current_price, symbol)
-for alert in triggered_alerts:
-    st.balloons()
-    st.success(f"🎯 Alerte déclenchée pour {symbol} à {format_currency(current_price, symbol)}")
-    
-    if st.session_state.email_config['enabled']:
-        subject = f"🚨 Alerte prix - {symbol}"
-        body = f"""
-        <h2>Alerte de prix déclenchée</h2>
-        <p><b>Symbole:</b> {symbol}</p>
-        <p><b>Prix actuel:</b> {format_currency(current_price, symbol)}</p>
-        <p><b>Condition:</b> {alert['condition']} {format_currency(alert['price'], symbol)}</p>
-        <p><b>Date:</b> {datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')} (heure Paris)</p>
-        """
-        send_email_alert(subject, body, st.session_state.email_config['email'])
-    
-    if alert.get('one_time', False):
-        st.session_state.price_alerts.remove(alert)
+sync_price_alerts()
+run_price_alerts(symbol, current_price)
+
+@st.fragment(run_every=live_refresh)
+def display_live_price(symbol, period, interval, hist):
+    """En-tête de prix et graphique principal, rafraîchis indépendamment du reste de la page"""
+    check_market_phase()
+    if live_refresh and not st.session_state.demo_mode:
+        fresh_hist = load_live_history(symbol, period, interval, live_refresh)
+        if fresh_hist is not None and not fresh_hist.empty:
+            hist = fresh_hist
+    
+    current_price = safe_get_metric(hist, 'Close')
+    currency = get_currency(symbol)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    previous_close = safe_get_metric(hist, 'Close', -2) if len(hist) > 1 else current_price
+    change = current_price - previous_close
+    change_pct = (change / previous_close * 100) if previous_close != 0 else 0
+    
+    with col1:
+        st.metric(
+            label="Prix actuel",
+            value=format_currency(current_price, symbol),
+            delta=f"{change:.2f} ({change_pct:.2f}%)"
+        )
+    
+    with col2:
+        day_high = safe_get_metric(hist, 'High')
+        st.metric("Plus haut", format_currency(day_high, symbol))
+    
+    with col3:
+        day_low = safe_get_metric(hist, 'Low')
+        st.metric("Plus bas", format_currency(day_low, symbol))
+    
+    with col4:
+        volume = safe_get_metric(hist, 'Volume')
+        if currency == 'EUR':
+            volume_formatted = f"{volume/1e9:.2f} Mrd" if volume > 1e9 else f"{volume/1e6:.2f} Mio" if volume > 1e6 else f"{volume:,.0f}"
+        else:
+            volume_formatted = f"{volume/1e6:.1f}M" if volume > 1e6 else f"{volume/1e3:.1f}K"
+        st.metric("Volume", volume_formatted)
+    
+    try:
+        germany_time = hist.index[-1].tz_convert(GERMANY_TIMEZONE)
+        st.caption(f"Dernière mise à jour: {hist.index[-1].strftime('%Y-%m-%d %H:%M:%S')} (heure Paris) / {germany_time.strftime('%H:%M:%S')} CET/CEST")
+    except:
+        st.caption(f"Dernière mise à jour: {datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')} (heure Paris)")
+    
+    # Graphique principal
+    st.subheader("📉 Évolution du prix")
+    
+    overlays = st.multiselect(
+        "Indicateurs superposés",
+        options=list(OVERLAY_STYLES.keys()),
+        default=DEFAULT_OVERLAYS
+    )
+    
+    # Indicateurs calculés une fois par version des données, étendus aux nouvelles barres
+    indicators = get_indicator_engine().compute(
+        (symbol, period, interval), hist, intraday=interval in INTRADAY_INTERVALS
+    )
+    
+    # Trace réduite au budget de points de la largeur du graphique (WebGL si nécessaire)
+    fig = build_price_figure(
+        hist,
+        title=f"{symbol} - {period} (heure Paris)",
+        price_label=f"Prix ({'€' if currency=='EUR' else '$'})",
+        candles=interval in INTRADAY_INTERVALS,
+        indicators=indicators,
+        overlays=overlays
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    with st.expander("📐 Indicateurs techniques"):
+        last = indicators.iloc[-1] if not indicators.empty else None
+        if last is not None:
+            col_t1, col_t2, col_t3, col_t4 = st.columns(4)
+            col_t1.metric("RSI 14", f"{last['RSI 14']:.1f}" if pd.notna(last['RSI 14']) else "N/A")
+            col_t2.metric("MACD", f"{last['MACD']:.3f}", delta=f"{last['MACD hist']:.3f}")
+            col_t3.metric("ATR 14", format_currency(last['ATR 14'], symbol))
+            col_t4.metric("VWAP", format_currency(last['VWAP'], symbol) if pd.notna(last['VWAP']) else "N/A")
+
 
 # ============================================================================
 # SECTION 1: TABLEAU DE BORD
@@ -743,110 +1106,7 @@ if menu == "📈 Tableau de bord":
         
         st.subheader(f"📊 Aperçu en temps réel - {company_name}")
         
-        col1, col2, col3, col4 = st.columns(4)
-        
-        previous_close = safe_get_metric(hist, 'Close', -2) if len(hist) > 1 else current_price
-        change = current_price - previous_close
-        change_pct = (change / previous_close * 100) if previous_close != 0 else 0
-        
-        with col1:
-            st.metric(
-                label="Prix actuel",
-                value=format_currency(current_price, symbol),
-                delta=f"{change:.2f} ({change_pct:.2f}%)"
-            )
-        
-        with col2:
-            day_high = safe_get_metric(hist, 'High')
-            st.metric("Plus haut", format_currency(day_high, symbol))
-        
-        with col3:
-            day_low = safe_get_metric(hist, 'Low')
-            st.metric("Plus bas", format_currency(day_low, symbol))
-        
-        with col4:
-            volume = safe_get_metric(hist, 'Volume')
-            if currency == 'EUR':
-                volume_formatted = f"{volume/1e9:.2f} Mrd" if volume > 1e9 else f"{volume/1e6:.2f} Mio" if volume > 1e6 else f"{volume:,.0f}"
-            else:
-                volume_formatted = f"{volume/1e6:.1f}M" if volume > 1e6 else f"{volume/1e3:.1f}K"
-            st.metric("Volume", volume_formatted)
-        
-        try:
-            germany_time = hist.index[-1].tz_convert(GERMANY_TIMEZONE)
-            st.caption(f"Dernière mise à jour: {hist.index[-1].strftime('%Y-%m-%d %H:%M:%S')} (heure Paris) / {germany_time.strftime('%H:%M:%S')} CET/CEST")
-        except:
-            st.caption(f"Dernière mise à jour: {datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')} (heure Paris)")
-        
-        # Graphique principal
-        st.subheader("📉 Évolution du prix")
-        
-        fig = go.Figure()
-        
-        if interval in ["1m", "5m", "15m", "30m", "1h"]:
-            fig.add_trace(go.Candlestick(
-                x=hist.index,
-                open=hist['Open'],
-                high=hist['High'],
-                low=hist['Low'],
-                close=hist['Close'],
-                name='Prix',
-                increasing_line_color='#000000',
-                decreasing_line_color='#ef553b'
-            ))
-        else:
-            fig.add_trace(go.Scatter(
-                x=hist.index,
-                y=hist['Close'],
-                mode='lines',
-                name='Prix',
-                line=dict(color='#DD0000', width=2)
-            ))
-        
-        if len(hist) >= 20:
-            ma_20 = hist['Close'].rolling(window=20).mean()
-            fig.add_trace(go.Scatter(
-                x=hist.index,
-                y=ma_20,
-                mode='lines',
-                name='MA 20',
-                line=dict(color='orange', width=1, dash='dash')
-            ))
-        
-        if len(hist) >= 50:
-            ma_50 = hist['Close'].rolling(window=50).mean()
-            fig.add_trace(go.Scatter(
-                x=hist.index,
-                y=ma_50,
-                mode='lines',
-                name='MA 50',
-                line=dict(color='purple', width=1, dash='dash')
-            ))
-        
-        fig.add_trace(go.Bar(
-            x=hist.index,
-            y=hist['Volume'],
-            name='Volume',
-            yaxis='y2',
-            marker=dict(color='lightgray', opacity=0.3)
-        ))
-        
-        fig.update_layout(
-            title=f"{symbol} - {period} (heure Paris)",
-            yaxis_title=f"Prix ({'€' if currency=='EUR' else '$'})",
-            yaxis2=dict(
-                title="Volume",
-                overlaying='y',
-                side='right',
-                showgrid=False
-            ),
-            xaxis_title="Date (heure Paris)",
-            height=600,
-            hovermode='x unified',
-            template='plotly_white'
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        display_live_price(symbol, period, interval, hist)
         
         # Informations sur l'entreprise
         with st.expander("ℹ️ Informations sur l'entreprise"):
@@ -874,6 +1134,8 @@ if menu == "📈 Tableau de bord":
                     st.write(f"**P/E :** {info.get('trailingPE', 'N/A')}")
                     st.write(f"**Dividende :** {info.get('dividendYield', 0)*100:.2f}%" if info.get('dividendYield') else "**Dividende :** N/A")
                     st.write(f"**Beta :** {info.get('beta', 'N/A')}")
+            elif get_metadata_cache().is_refreshing(symbol):
+                st.write("⏳ Chargement des informations en cours...")
             else:
                 st.write("Informations non disponibles")
     else:
@@ -885,6 +1147,10 @@ if menu == "📈 Tableau de bord":
 elif menu == "💰 Portefeuille virtuel":
     st.subheader("💰 Gestion de portefeuille virtuel - Actions Allemandes")
     
+    if isinstance(st.session_state.portfolio, dict):
+        # Ancien format {symbole: [positions]} -> table en colonnes
+        st.session_state.portfolio = positions_from_records(st.session_state.portfolio, get_currency)
+    
     col1, col2 = st.columns([2, 1])
     
     with col2:
@@ -903,126 +1169,96 @@ elif menu == "💰 Portefeuille virtuel":
             
             if st.form_submit_button("Ajouter au portefeuille"):
                 if symbol_pf and shares > 0:
-                    if symbol_pf not in st.session_state.portfolio:
-                        st.session_state.portfolio[symbol_pf] = []
-                    
-                    st.session_state.portfolio[symbol_pf].append({
-                        'shares': shares,
-                        'buy_price': buy_price,
-                        'date': datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
-                    })
+                    st.session_state.portfolio = add_position(
+                        st.session_state.portfolio,
+                        symbol_pf,
+                        shares,
+                        buy_price,
+                        get_currency(symbol_pf),
+                        datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+                    )
                     st.success(f"✅ {shares} actions {symbol_pf} ajoutées")
     
     with col1:
         st.markdown("### 📊 Performance du portefeuille")
         
-        if st.session_state.portfolio:
-            portfolio_data = []
-            total_value_eur = 0
-            total_cost_eur = 0
-            total_value_usd = 0
-            total_cost_usd = 0
+        positions = st.session_state.portfolio
+        if not positions.empty:
+            # Taux de change: une consultation du cache FX par exécution (toutes devises)
+            pf_currencies = ['USD'] + list(positions['currency'].unique())
+            if st.session_state.demo_mode:
+                fx_per_eur = {c: FALLBACK_RATES.get(c, 1.0) for c in pf_currencies}
+                fx_source = "taux de démonstration"
+            else:
+                fx_per_eur = get_fx_rates().rates_per_eur(pf_currencies)
+                fx_source = f"Yahoo {FX_PAIRS['USD']}" if get_fx_rates().is_live('USD') else "taux de secours"
+            eur_usd_rate = fx_per_eur['USD']
+            rates_to_eur = {c: 1.0 / rate for c, rate in fx_per_eur.items()}
             
-            # Taux de change approximatif
-            eur_usd_rate = 1.08  # 1 EUR = 1.08 USD
+            # Vecteur de cours: un seul tableau (requêtes parallèles) pour tout le portefeuille
+            pf_symbols = list(positions['symbol'].unique())
+            if st.session_state.demo_mode:
+                prices = pd.Series({s: DEMO_DATA[s]['current_price'] for s in pf_symbols if s in DEMO_DATA}, dtype='float64')
+            else:
+                prices = load_quote_snapshot(tuple(pf_symbols))['price']
             
-            for symbol_pf, positions in st.session_state.portfolio.items():
-                try:
-                    if st.session_state.demo_mode and symbol_pf in DEMO_DATA:
-                        current = DEMO_DATA[symbol_pf]['current_price']
-                    else:
-                        ticker = yf.Ticker(symbol_pf)
-                        hist = ticker.history(period='1d')
-                        current = hist['Close'].iloc[-1] if not hist.empty else 0
-                    
-                    exchange = get_exchange(symbol_pf)
-                    currency = get_currency(symbol_pf)
-                    
-                    for pos in positions:
-                        shares = pos['shares']
-                        buy_price = pos['buy_price']
-                        cost = shares * buy_price
-                        value = shares * current
-                        profit = value - cost
-                        profit_pct = (profit / cost * 100) if cost > 0 else 0
-                        
-                        if currency == 'EUR':
-                            total_cost_eur += cost
-                            total_value_eur += value
-                            total_cost_usd += cost * eur_usd_rate
-                            total_value_usd += value * eur_usd_rate
-                        else:
-                            total_cost_usd += cost
-                            total_value_usd += value
-                            total_cost_eur += cost / eur_usd_rate
-                            total_value_eur += value / eur_usd_rate
-                        
-                        if currency == 'EUR':
-                            buy_price_str = f"€{buy_price:,.2f}"
-                            current_str = f"€{current:,.2f}"
-                            value_str = f"€{value:,.2f}"
-                            profit_str = f"€{profit:,.2f}"
-                        else:
-                            buy_price_str = f"${buy_price:.2f}"
-                            current_str = f"${current:.2f}"
-                            value_str = f"${value:,.2f}"
-                            profit_str = f"${profit:,.2f}"
-                        
-                        portfolio_data.append({
-                            'Symbole': symbol_pf,
-                            'Marché': exchange,
-                            'Devise': currency,
-                            'Actions': shares,
-                            "Prix d'achat": buy_price_str,
-                            'Prix actuel': current_str,
-                            'Valeur': value_str,
-                            'Profit': profit_str,
-                            'Profit %': f"{profit_pct:.1f}%"
-                        })
-                except Exception as e:
+            for symbol_pf in pf_symbols:
+                if symbol_pf not in prices.index:
                     st.warning(f"Impossible de charger {symbol_pf}")
             
-            if portfolio_data:
-                total_profit_eur = total_value_eur - total_cost_eur
-                total_profit_pct_eur = (total_profit_eur / total_cost_eur * 100) if total_cost_eur > 0 else 0
+            valued = value_positions(positions, prices, rates_to_eur, eur_usd_rate)
+            valued = valued[valued['current'].notna()]
+            
+            if not valued.empty:
+                totals = portfolio_totals(valued)
                 
                 st.markdown("#### Total en Euros (EUR)")
                 col_i1, col_i2, col_i3 = st.columns(3)
-                col_i1.metric("Valeur totale", f"€{total_value_eur:,.2f}")
-                col_i2.metric("Coût total", f"€{total_cost_eur:,.2f}")
+                col_i1.metric("Valeur totale", f"€{totals['eur']['value']:,.2f}")
+                col_i2.metric("Coût total", f"€{totals['eur']['cost']:,.2f}")
                 col_i3.metric(
                     "Profit total",
-                    f"€{total_profit_eur:,.2f}",
-                    delta=f"{total_profit_pct_eur:.1f}%"
+                    f"€{totals['eur']['profit']:,.2f}",
+                    delta=f"{totals['eur']['profit_pct']:.1f}%"
                 )
                 
-                total_profit_usd = total_value_usd - total_cost_usd
-                total_profit_pct_usd = (total_profit_usd / total_cost_usd * 100) if total_cost_usd > 0 else 0
-                
                 st.markdown("#### Total en Dollars (USD)")
                 col_u1, col_u2, col_u3 = st.columns(3)
-                col_u1.metric("Valeur totale", f"${total_value_usd:,.2f}")
-                col_u2.metric("Coût total", f"${total_cost_usd:,.2f}")
-                col_u3.metric("Profit total", f"${total_profit_usd:,.2f}", delta=f"{total_profit_pct_usd:.1f}%")
+                col_u1.metric("Valeur totale", f"${totals['usd']['value']:,.2f}")
+                col_u2.metric("Coût total", f"${totals['usd']['cost']:,.2f}")
+                col_u3.metric("Profit total", f"${totals['usd']['profit']:,.2f}", delta=f"{totals['usd']['profit_pct']:.1f}%")
                 
-                st.caption(f"Taux de change utilisé: 1 EUR = {eur_usd_rate} USD")
+                st.caption(f"Taux de change utilisé: 1 EUR = {eur_usd_rate:.4f} USD ({fx_source})")
                 
+                # Mise en forme uniquement à l'affichage
                 st.markdown("### 📋 Positions détaillées")
-                df_portfolio = pd.DataFrame(portfolio_data)
-                st.dataframe(df_portfolio, use_container_width=True)
+                currencies = valued['currency'].tolist()
+                df_portfolio = pd.DataFrame({
+                    'Symbole': valued['symbol'],
+                    'Marché': valued['symbol'].map(get_exchange),
+                    'Devise': valued['currency'],
+                    'Actions': valued['shares'].astype(int),
+                    "Prix d'achat": format_money_column(valued['buy_price'], currencies),
+                    'Prix actuel': format_money_column(valued['current'], currencies),
+                    'Valeur': format_money_column(valued['value'], currencies),
+                    'Profit': format_money_column(valued['profit'], currencies),
+                    'Profit %': [f"{p:.1f}%" for p in valued['profit_pct']]
+                })
+                st.dataframe(df_portfolio, use_container_width=True, hide_index=True)
                 
                 try:
+                    allocation = valued.groupby('symbol')['value_eur'].sum()
                     fig_pie = px.pie(
-                        names=[p['Symbole'] for p in portfolio_data],
-                        values=[float(p['Valeur'].replace('€', '').replace('$', '').replace(',', '')) for p in portfolio_data],
-                        title="Répartition du portefeuille"
+                        names=allocation.index,
+                        values=allocation.values,
+                        title="Répartition du portefeuille (contre-valeur EUR)"
                     )
                     st.plotly_chart(fig_pie)
                 except:
                     st.warning("Impossible de générer le graphique")
                 
                 if st.button("🗑️ Vider le portefeuille"):
-                    st.session_state.portfolio = {}
+                    st.session_state.portfolio = empty_positions()
                     st.rerun()
             else:
                 st.info("Aucune donnée de performance disponible")
@@ -1061,12 +1297,27 @@ elif menu == "🔔 Alertes de prix":
             
             one_time = alert_type == "Une fois"
             
+            col_hyst, col_cool = st.columns(2)
+            with col_hyst:
+                hysteresis = st.number_input(
+                    "Hystérésis (%)", min_value=0.0, max_value=20.0, step=0.5,
+                    value=DEFAULT_HYSTERESIS_PCT,
+                    help="Écart à repasser sous/au-dessus du seuil avant un nouveau déclenchement"
+                )
+            with col_cool:
+                cooldown_minutes = st.number_input(
+                    "Délai entre notifications (min)", min_value=0, max_value=1440, step=5,
+                    value=DEFAULT_COOLDOWN // 60
+                )
+            
             if st.form_submit_button("Créer l'alerte"):
-                st.session_state.price_alerts.append({
+                add_price_alert({
                     'symbol': alert_symbol,
                     'price': alert_price,
                     'condition': condition,
                     'one_time': one_time,
+                    'hysteresis': hysteresis,
+                    'cooldown': cooldown_minutes * 60,
                     'created': datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
                 })
                 st.success(f"✅ Alerte créée pour {alert_symbol} à {format_currency(alert_price, alert_symbol)}")
@@ -1075,19 +1326,41 @@ elif menu == "🔔 Alertes de prix":
         st.markdown("### 📋 Alertes actives")
         if st.session_state.price_alerts:
             for i, alert in enumerate(st.session_state.price_alerts):
+                state = st.session_state.alert_tracker.state(alert)
+                state_label = "🔕 Déclenchée (attend le réarmement)" if state == 'fired' else "🔔 Armée"
                 with st.container():
                     st.markdown(f"""
                     <div class='alert-box alert-warning'>
                         <b>{alert['symbol']}</b> - {alert['condition']} {format_currency(alert['price'], alert['symbol'])}<br>
-                        <small>Créée: {alert['created']} (heure Paris) | {('Usage unique' if alert['one_time'] else 'Permanent')}</small>
+                        <small>Créée: {alert['created']} (heure Paris) | {('Usage unique' if alert['one_time'] else 'Permanent')} | {state_label}</small>
                     </div>
                     """, unsafe_allow_html=True)
                     
                     if st.button(f"Supprimer", key=f"del_alert_{i}"):
-                        st.session_state.price_alerts.pop(i)
+                        remove_price_alerts([alert])
                         st.rerun()
         else:
             st.info("Aucune alerte active")
+        
+        if alert_owner() is None:
+            if auth_configured():
+                st.caption("💾 Alertes gardées dans cette session seulement: connectez-vous pour les "
+                           "enregistrer et recevoir les notifications du démon")
+                st.button("🔐 Se connecter", on_click=st.login)
+            else:
+                st.caption("💾 Alertes gardées dans cette session seulement: l'enregistrement demande "
+                           "la connexion des utilisateurs (section [auth] de .streamlit/secrets.toml)")
+        else:
+            st.caption(f"💾 Alertes enregistrées pour {st.user.get('email')}")
+            st.button("Se déconnecter", on_click=st.logout)
+        
+        daemon = get_alert_store().daemon_status(DAEMON_STALE_AFTER)
+        if daemon is not None:
+            next_poll = datetime.fromtimestamp(daemon['next_poll'], USER_TIMEZONE).strftime('%d/%m %H:%M:%S')
+            st.caption(f"🛰️ Démon de surveillance actif: prochain passage {next_poll} (heure Paris)")
+        else:
+            st.caption("🛰️ Surveillance active seulement tant qu'un onglet est ouvert. "
+                       "Pour une surveillance continue: `python alert_daemon.py`")
 
 # ============================================================================
 # SECTION 4: NOTIFICATIONS EMAIL
@@ -1095,7 +1368,7 @@ elif menu == "🔔 Alertes de prix":
 elif menu == "📧 Notifications email":
     st.subheader("📧 Configuration des notifications email")
     
-    with st.form("email_config"):
+    with st.form("email_config_form"):
         enabled = st.checkbox("Activer les notifications email", value=st.session_state.email_config['enabled'])
         
         col1, col2 = st.columns(2)
@@ -1107,6 +1380,12 @@ elif menu == "📧 Notifications email":
             email = st.text_input("Adresse email", value=st.session_state.email_config['email'])
             password = st.text_input("Mot de passe", type="password", value=st.session_state.email_config['password'])
         
+        digest_window = st.number_input(
+            "Regrouper les alertes (secondes, 0 = un email par alerte)",
+            min_value=0, max_value=3600, step=30,
+            value=int(st.session_state.email_config.get('digest_window', 0))
+        )
+        
         test_email = st.text_input("Email de test (optionnel)")
         
         col_btn1, col_btn2 = st.columns(2)
@@ -1117,24 +1396,47 @@ elif menu == "📧 Notifications email":
                     'smtp_server': smtp_server,
                     'smtp_port': smtp_port,
                     'email': email,
-                    'password': password
+                    'password': password,
+                    'digest_window': digest_window
                 }
+                owner = alert_owner()
+                if owner is not None:
+                    get_alert_store().save_email_config(owner, st.session_state.email_config)
                 st.success("Configuration sauvegardée !")
         
         with col_btn2:
             if st.form_submit_button("📨 Tester"):
                 if test_email:
-                    if send_email_alert(
+                    sent = send_email_alert(
                         "Test de notification",
                         f"<h2>Test réussi !</h2><p>Votre configuration email fonctionne correctement !</p><p>Heure d'envoi: {datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')} (heure Paris)</p>",
                         test_email
-                    ):
-                        st.success("Email de test envoyé !")
+                    )
+                    if sent is None:
+                        st.warning("Les notifications email sont désactivées")
                     else:
-                        st.error("Échec de l'envoi")
+                        try:
+                            ok = sent.result(timeout=60)
+                        except TimeoutError:
+                            ok = False
+                        if ok:
+                            st.success("Email de test envoyé !")
+                        else:
+                            st.error("Échec de l'envoi")
     
     with st.expander("📋 Aperçu de la configuration"):
         st.json(st.session_state.email_config)
+    
+    config = st.session_state.email_config
+    if config['enabled']:
+        dispatcher = get_email_dispatcher(
+            config['smtp_server'], config['smtp_port'], config['email'],
+            config['password'], config.get('digest_window', 0)
+        )
+        with st.expander("📬 File d'envoi"):
+            st.json(dispatcher.stats())
+            for error in dispatcher.errors:
+                st.caption(error)
 
 # ============================================================================
 # SECTION 5: EXPORT DES DONNÉES
@@ -1150,14 +1452,6 @@ elif menu == "📤 Export des données":
             display_hist = hist.copy()
             display_hist.index = display_hist.index.strftime('%Y-%m-%d %H:%M:%S (heure Paris)')
             st.dataframe(display_hist.tail(20))
-            
-            csv = hist.to_csv()
-            st.download_button(
-                label="📥 Télécharger en CSV",
-                data=csv,
-                file_name=f"{symbol}_data_{datetime.now(USER_TIMEZONE).strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
         
         with col2:
             st.markdown("### 📈 Rapport PDF")
@@ -1178,25 +1472,101 @@ elif menu == "📤 Export des données":
                 else:
                     st.write(f"{key}: {value}")
             
-            json_data = {
+            json_header = {
                 'symbol': symbol,
                 'exchange': get_exchange(symbol),
                 'currency': get_currency(symbol),
                 'last_update': datetime.now(USER_TIMEZONE).isoformat(),
                 'timezone': 'Europe/Paris',
                 'current_price': float(current_price) if current_price else 0,
-                'statistics': {k: (float(v) if isinstance(v, (int, float)) else v) for k, v in stats.items()},
-                'data': hist.reset_index().to_dict(orient='records')
+                'statistics': {k: (float(v) if isinstance(v, (int, float)) else v) for k, v in stats.items()}
             }
+        
+        with col1:
+            export_format = st.selectbox("Format d'export", list(EXPORT_FORMATS), key="export_format")
+            extension, mime = EXPORT_FORMATS[export_format]
+            st.caption(f"{len(hist):,} lignes - le fichier est généré au moment du téléchargement")
             
+            # Le fichier n'est construit qu'au clic, par blocs de lignes
             st.download_button(
-                label="📥 Télécharger en JSON",
-                data=json.dumps(json_data, indent=2, default=str),
-                file_name=f"{symbol}_data_{datetime.now(USER_TIMEZONE).strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json"
+                label=f"📥 Télécharger en {export_format}",
+                data=lambda: export_history(hist, export_format, json_header),
+                file_name=f"{symbol}_data_{datetime.now(USER_TIMEZONE).strftime('%Y%m%d_%H%M%S')}.{extension}",
+                mime=mime
             )
     else:
         st.warning(f"Aucune donnée à exporter pour {symbol}")
+    
+    st.markdown("---")
+    st.markdown("### 📦 Export groupé")
+    
+    col_universe, col_period, col_layout = st.columns(3)
+    with col_universe:
+        universe_name = st.selectbox("Univers", list(EXPORT_UNIVERSES), key="bulk_universe")
+    with col_period:
+        bulk_period = st.selectbox("Période", ["1mo", "3mo", "6mo", "1y", "2y", "5y", "max"], index=3, key="bulk_period")
+    with col_layout:
+        bulk_layout = st.radio(
+            "Organisation",
+            ["Un fichier par symbole", "Table unique (format long)"],
+            key="bulk_layout"
+        )
+    
+    universe = EXPORT_UNIVERSES[universe_name] or st.session_state.watchlist
+    st.caption(f"{len(universe)} symboles - historiques journaliers téléchargés en parallèle, archive ZIP de fichiers Parquet avec manifeste")
+    
+    if st.button("📦 Préparer l'archive", key="bulk_export_start"):
+        progress = st.progress(0.0, text="Téléchargement des historiques...")
+        histories, errors = {}, {}
+        
+        if st.session_state.demo_mode:
+            fetch_fn = lambda s: generate_demo_history(s, bulk_period, "1d")
+        else:
+            fetch_fn = lambda s: download_stock_history(s, bulk_period, "1d", wait=BULK_EXPORT_TIMEOUT)
+        
+        for done, (sym, result, error) in enumerate(
+            iter_fetch(universe, fetch_fn, max_workers=FETCH_MAX_WORKERS, timeout=BULK_EXPORT_TIMEOUT), 1
+        ):
+            if error is None:
+                histories[sym] = result
+            else:
+                errors[sym] = str(error) or type(error).__name__
+            progress.progress(done / len(universe), text=f"{done}/{len(universe)} - {sym}")
+        
+        progress.progress(1.0, text="Création de l'archive...")
+        archive = write_archive(
+            histories,
+            layout='long' if bulk_layout.startswith("Table") else 'per_symbol',
+            manifest={
+                'universe': universe_name,
+                'symbols': list(universe),
+                'period': bulk_period,
+                'interval': '1d',
+                'timezone': 'Europe/Paris',
+                'created': datetime.now(USER_TIMEZONE).isoformat(),
+                'demo': st.session_state.demo_mode
+            },
+            errors=errors
+        )
+        progress.empty()
+        st.session_state.bulk_export = (
+            f"export_{universe_name.split()[0].lower()}_{bulk_period}_{datetime.now(USER_TIMEZONE).strftime('%Y%m%d_%H%M%S')}.zip",
+            archive,
+            len(histories),
+            errors
+        )
+    
+    if 'bulk_export' in st.session_state:
+        file_name, archive, exported, errors = st.session_state.bulk_export
+        st.success(f"✅ {exported} symboles exportés ({len(archive) / 1e6:.1f} Mo)")
+        if errors:
+            st.warning("Symboles en échec: " + ", ".join(f"{s} ({e})" for s, e in errors.items()))
+        st.download_button(
+            label="📥 Télécharger l'archive",
+            data=archive,
+            file_name=file_name,
+            mime="application/zip"
+        )
 
 # ============================================================================
 # SECTION 6: PRÉDICTIONS ML
@@ -1219,38 +1589,47 @@ elif menu == "🤖 Prédictions ML":
         - Résultats des élections et stabilité politique
         """)
         
-        df_pred = hist[['Close']].reset_index()
-        df_pred['Days'] = (df_pred['Date'] - df_pred['Date'].min()).dt.days
-        
-        X = df_pred['Days'].values.reshape(-1, 1)
-        y = df_pred['Close'].values
+        dates, X, y = prediction_inputs(hist)
         
         col1, col2 = st.columns(2)
         
+        with col2:
+            show_confidence = st.checkbox("Afficher l'intervalle de confiance", value=True)
+            auto_select = st.checkbox(
+                "🎯 Sélection automatique du modèle",
+                help="Compare les degrés 1 à 5 et des variantes régularisées (ridge) par validation croisée temporelle"
+            )
+        
         with col1:
             days_to_predict = st.slider("Jours à prédire", min_value=1, max_value=30, value=7)
-            degree = st.slider("Degré du polynôme", min_value=1, max_value=5, value=2)
+            degree = st.slider("Degré du polynôme", min_value=1, max_value=5, value=2, disabled=auto_select)
         
-        with col2:
-            show_confidence = st.checkbox("Afficher l'intervalle de confiance", value=True)
+        alpha = 0.0
+        if auto_select:
+            # Calculée une fois par version des données, pas à chaque mouvement de curseur
+            selection, best_params = select_prediction_model(symbol, period, interval, data_hash(X, y), hist)
+            if best_params is not None:
+                degree = best_params['degree']
+                alpha = best_params.get('alpha', 0.0)
+                with st.expander(f"🎯 Modèle retenu: {params_label(best_params)} (validation croisée, 5 plis)"):
+                    st.dataframe(selection.round(3), use_container_width=True)
+            else:
+                st.caption("Historique trop court (ou trop peu de jours distincts) pour la validation croisée: degré choisi manuellement")
         
-        model = make_pipeline(
-            PolynomialFeatures(degree=degree),
-            LinearRegression()
+        # Mis à jour avec les seules nouvelles barres depuis le dernier passage (même après
+        # un redémarrage): l'horizon ne fait qu'évaluer le modèle
+        fitted = get_online_models().get(
+            symbol, period, interval, degree, alpha, hist, persist=not st.session_state.demo_mode
         )
-        model.fit(X, y)
-        
-        last_day = X[-1][0]
-        future_days = np.arange(last_day + 1, last_day + days_to_predict + 1).reshape(-1, 1)
-        predictions = model.predict(future_days)
+        predictions = fitted.forecast(days_to_predict)
         
-        last_date = df_pred['Date'].iloc[-1]
+        last_date = dates[-1]
         future_dates = [last_date + timedelta(days=i+1) for i in range(days_to_predict)]
         
         fig_pred = go.Figure()
         
         fig_pred.add_trace(go.Scatter(
-            x=df_pred['Date'],
+            x=dates,
             y=y,
             mode='lines',
             name='Historique',
@@ -1267,11 +1646,8 @@ elif menu == "🤖 Prédictions ML":
         ))
         
         if show_confidence:
-            residuals = y - model.predict(X)
-            std_residuals = np.std(residuals)
-            
-            upper_bound = predictions + 2 * std_residuals
-            lower_bound = predictions - 2 * std_residuals
+            upper_bound = predictions + 2 * fitted.residual_std
+            lower_bound = predictions - 2 * fitted.residual_std
             
             fig_pred.add_trace(go.Scatter(
                 x=future_dates + future_dates[::-1],
@@ -1301,15 +1677,76 @@ elif menu == "🤖 Prédictions ML":
         st.dataframe(pred_df, use_container_width=True)
         
         st.markdown("### 📊 Performance du modèle")
-        residuals = y - model.predict(X)
-        mse = np.mean(residuals**2)
-        rmse = np.sqrt(mse)
-        mae = np.mean(np.abs(residuals))
-        
         col_m1, col_m2, col_m3 = st.columns(3)
-        col_m1.metric("RMSE", f"{format_currency(rmse, symbol)}")
-        col_m2.metric("MAE", f"{format_currency(mae, symbol)}")
-        col_m3.metric("R²", f"{model.score(X, y):.3f}")
+        col_m1.metric("RMSE", f"{format_currency(fitted.rmse, symbol)}")
+        col_m2.metric("MAE", f"{format_currency(fitted.mae, symbol)}")
+        col_m3.metric("R²", f"{fitted.r2:.3f}")
+        st.caption("Métriques dans l'échantillon: le modèle est évalué sur les données qui ont servi à l'ajuster")
+        
+        st.markdown("### 🧬 Variables explicatives")
+        benchmark = load_benchmark_history(period, interval)
+        # Calculées une fois par version des données, étendues aux nouvelles barres
+        features = get_feature_store().compute((symbol, period, interval), hist, benchmark)
+        correlations = information_coefficients(features, hist['Close'], days_to_predict)
+        st.dataframe(pd.DataFrame({
+            'Dernière valeur': features.iloc[-1],
+            f'Corrélation avec le rendement à {days_to_predict} barres': correlations
+        }).round(4), use_container_width=True)
+        st.caption("Rendements logarithmiques; volatilité sur 20 barres; volume en écarts-types de sa moyenne sur 20 barres")
+        if benchmark is None:
+            st.caption(f"⚠️ Historique de {BENCHMARK_SYMBOL} indisponible: variables relatives au DAX non calculées")
+        
+        st.markdown("### 🧪 Backtest walk-forward (hors échantillon)")
+        col_bt1, col_bt2, col_bt3 = st.columns(3)
+        with col_bt1:
+            bt_window_type = st.radio("Fenêtre d'apprentissage", ["Croissante", "Glissante"], key="bt_window_type")
+        with col_bt2:
+            bt_window = st.slider("Taille de la fenêtre glissante (barres)", min_value=30, max_value=500, value=120, step=10,
+                                  disabled=bt_window_type == "Croissante", key="bt_window")
+        with col_bt3:
+            bt_step = st.slider("Pas entre deux réajustements (barres)", min_value=1, max_value=20, value=1, key="bt_step")
+        
+        bt_params = (symbol, period, interval, len(hist), days_to_predict, bt_window_type, bt_window, bt_step)
+        if st.button("▶️ Lancer le backtest (degrés 1 à 5 et régression sur variables)", key="backtest_start"):
+            with st.spinner("Réajustement des modèles sur chaque fenêtre..."):
+                bt_options = dict(
+                    horizon=days_to_predict,
+                    min_train=30,
+                    window=bt_window if bt_window_type == "Glissante" else None,
+                    step=bt_step
+                )
+                # Même fenêtres pour la tendance polynomiale et la ridge sur les variables ci-dessus
+                feature_results = walk_forward(hist, FEATURE_RIDGE_GRID, model='feature_ridge',
+                                               features=features, **bt_options)
+                st.session_state.backtest = (bt_params, pd.concat([
+                    walk_forward(hist, [{'degree': d} for d in range(1, 6)], **bt_options),
+                    feature_results.rename(index=lambda p: f"variables, {p}", level=0)
+                ]))
+        
+        if 'backtest' in st.session_state and st.session_state.backtest[0] == bt_params:
+            backtest_results = st.session_state.backtest[1]
+            if backtest_results.empty:
+                st.warning("Historique trop court pour ce backtest")
+            else:
+                # Chaque horizon h correspond à la h-ième barre suivant la fin de la fenêtre
+                by_degree = backtest_results.groupby(level='params').mean()
+                best = by_degree['rmse'].idxmin()
+                st.success(f"Meilleur paramétrage hors échantillon: {best} (RMSE moyen {format_currency(by_degree.loc[best, 'rmse'], symbol)})")
+                
+                fig_bt = px.line(
+                    backtest_results.reset_index(), x='horizon', y='rmse', color='params', markers=True,
+                    labels={'horizon': 'Horizon (barres)', 'rmse': 'RMSE hors échantillon', 'params': 'Modèle'}
+                )
+                fig_bt.update_layout(template='plotly_white', height=350)
+                st.plotly_chart(fig_bt, use_container_width=True)
+                
+                st.dataframe(pd.DataFrame({
+                    'RMSE': by_degree['rmse'].map(lambda v: format_currency(v, symbol)),
+                    'MAE': by_degree['mae'].map(lambda v: format_currency(v, symbol)),
+                    'MAPE %': by_degree['mape'].round(2),
+                    'Bonne direction %': by_degree['hit_rate'].round(1),
+                    'Fenêtres': by_degree['windows'].astype(int)
+                }), use_container_width=True)
         
         st.markdown("### 📈 Analyse des tendances")
         last_price = current_price
@@ -1329,6 +1766,52 @@ elif menu == "🤖 Prédictions ML":
         
         st.info(f"**Tendance prévue:** {trend} - {strength}")
         
+        st.markdown("### 🏁 Prévisions groupées - liste de suivi")
+        st.caption(f"Même modèle (degré {degree}, horizon {days_to_predict} jours, période {period}) ajusté pour tous les symboles en un seul calcul")
+        
+        if st.button("🚀 Lancer les prévisions groupées", key="batch_forecast_start"):
+            watchlist = st.session_state.watchlist
+            if st.session_state.demo_mode:
+                fetch_fn = lambda s: generate_demo_history(s, period, interval)
+            else:
+                fetch_fn = lambda s: download_stock_history(s, period, interval, wait=BULK_EXPORT_TIMEOUT)
+            
+            with st.spinner(f"Chargement de {len(watchlist)} historiques..."):
+                histories, errors = fetch_many(watchlist, fetch_fn, max_workers=FETCH_MAX_WORKERS, timeout=BULK_EXPORT_TIMEOUT)
+            ranking = batch_forecast(histories, degree, days_to_predict)
+            
+            # Dernières valeurs des variables de chaque symbole (mémorisées entre deux lancements)
+            benchmark = load_benchmark_history(period, interval)
+            feature_store = get_feature_store()
+            latest = pd.DataFrame({
+                sym: feature_store.compute((sym, period, interval), histories[sym], benchmark).iloc[-1]
+                for sym in ranking.index
+            }).T
+            st.session_state.batch_forecast = (
+                (period, interval, degree, days_to_predict),
+                ranking.join(latest.reindex(columns=['Vol 20', 'Rel DAX 5'])),
+                errors
+            )
+        
+        if 'batch_forecast' in st.session_state:
+            params, ranking, errors = st.session_state.batch_forecast
+            if params != (period, interval, degree, days_to_predict):
+                st.caption("⚠️ Paramètres modifiés depuis le dernier calcul: relancez les prévisions groupées")
+            
+            ranking_display = pd.DataFrame({
+                'Symbole': ranking.index,
+                'Dernier cours': [format_currency(v, s) for v, s in zip(ranking['last_close'], ranking.index)],
+                'Prix prédit': [format_currency(v, s) for v, s in zip(ranking['predicted'], ranking.index)],
+                'Variation prévue %': ranking['change_pct'].round(2).to_numpy(),
+                'R²': ranking['r2'].round(3).to_numpy(),
+                'Volatilité 20 barres %': (ranking['Vol 20'] * 100).round(2).to_numpy(),
+                'Relatif DAX 5 barres %': (ranking['Rel DAX 5'] * 100).round(2).to_numpy(),
+                'Barres': ranking['bars'].to_numpy()
+            })
+            st.dataframe(ranking_display, use_container_width=True, hide_index=True)
+            if errors:
+                st.warning("Symboles sans données: " + ", ".join(errors))
+        
         with st.expander("🇩🇪 Facteurs influençant le marché allemand"):
             st.markdown("""
             **Indicateurs économiques clés:**
@@ -1466,8 +1949,7 @@ elif menu == "🇩🇪 Indices DAX, MDAX & SDAX":
                 st.plotly_chart(fig_index, use_container_width=True)
                 
             else:
-                index_ticker = yf.Ticker(selected_index)
-                index_hist = index_ticker.history(period=perf_period)
+                index_hist = fetch_shared_history(selected_index, period=perf_period).copy()
                 
                 if not index_hist.empty:
                     if index_hist.index.tz is None:
@@ -1500,8 +1982,11 @@ elif menu == "🇩🇪 Indices DAX, MDAX & SDAX":
                     ))
                     
                     if len(index_hist) > 20:
-                        ma_20 = index_hist['Close'].rolling(window=20).mean()
-                        ma_50 = index_hist['Close'].rolling(window=50).mean()
+                        index_indicators = get_indicator_engine().compute(
+                            (selected_index, perf_period, '1d'), index_hist
+                        )
+                        ma_20 = index_indicators['SMA 20']
+                        ma_50 = index_indicators['SMA 50']
                         
                         fig_index.add_trace(go.Scatter(
                             x=index_hist.index,
@@ -1545,51 +2030,63 @@ elif menu == "🇩🇪 Indices DAX, MDAX & SDAX":
     st.markdown("### 📊 Comparaison des indices")
     
     comparison_data = []
-    for idx, name in list(german_indices.items())[:10]:
-        try:
-            if st.session_state.demo_mode:
-                if idx == '^GDAXI':
-                    current = random.uniform(15000, 18000)
-                elif idx == '^MDAXI':
-                    current = random.uniform(25000, 30000)
-                elif idx == '^SDAXI':
-                    current = random.uniform(13000, 16000)
-                elif idx == '^TECDAX':
-                    current = random.uniform(3000, 3500)
-                else:
-                    current = random.uniform(5000, 10000)
-                    
-                prev = current * random.uniform(0.95, 1.05)
-                change_pct = ((current - prev) / prev * 100)
-                
-                comparison_data.append({
-                    'Indice': name,
-                    'Symbole': idx,
-                    'Valeur': f"{current:,.2f}",
-                    'Variation 5j': f"{change_pct:.2f}%",
-                    'Direction': '📈' if change_pct > 0 else '📉' if change_pct < 0 else '➡️'
-                })
+    comparison_errors = {}
+    comparison_indices = list(german_indices.items())[:10]
+    if st.session_state.demo_mode:
+        for idx, name in comparison_indices:
+            if idx == '^GDAXI':
+                current = random.uniform(15000, 18000)
+            elif idx == '^MDAXI':
+                current = random.uniform(25000, 30000)
+            elif idx == '^SDAXI':
+                current = random.uniform(13000, 16000)
+            elif idx == '^TECDAX':
+                current = random.uniform(3000, 3500)
             else:
-                ticker = yf.Ticker(idx)
-                hist = ticker.history(period="5d")
-                if not hist.empty:
-                    current = hist['Close'].iloc[-1]
-                    prev = hist['Close'].iloc[0]
-                    change_pct = ((current - prev) / prev * 100) if prev != 0 else 0
-                    
-                    comparison_data.append({
-                        'Indice': name,
-                        'Symbole': idx,
-                        'Valeur': f"{current:,.2f}",
-                        'Variation 5j': f"{change_pct:.2f}%",
-                        'Direction': '📈' if change_pct > 0 else '📉' if change_pct < 0 else '➡️'
-                    })
-        except:
-            pass
+                current = random.uniform(5000, 10000)
+                
+            prev = current * random.uniform(0.95, 1.05)
+            change_pct = ((current - prev) / prev * 100)
+            
+            comparison_data.append({
+                'Indice': name,
+                'Symbole': idx,
+                'Valeur': f"{current:,.2f}",
+                'Variation 5j': f"{change_pct:.2f}%",
+                'Direction': '📈' if change_pct > 0 else '📉' if change_pct < 0 else '➡️'
+            })
+    else:
+        # Un seul panel pour tous les indices, conservé jusqu'à la clôture quand le marché est fermé
+        try:
+            comparison_closes, comparison_errors = load_index_panel(
+                tuple(idx for idx, _ in comparison_indices),
+                max_age=cache_max_age(INDEX_PANEL_TTL, symbols=[idx for idx, _ in comparison_indices])
+            )
+        except Exception as e:
+            comparison_closes = {}
+            comparison_errors = {idx: e for idx, _ in comparison_indices}
+        
+        for idx, name in comparison_indices:
+            if idx not in comparison_closes:
+                continue
+            closes = comparison_closes[idx]
+            current = closes.iloc[-1]
+            prev = closes.iloc[0]
+            change_pct = ((current - prev) / prev * 100) if prev != 0 else 0
+            
+            comparison_data.append({
+                'Indice': name,
+                'Symbole': idx,
+                'Valeur': f"{current:,.2f}",
+                'Variation 5j': f"{change_pct:.2f}%",
+                'Direction': '📈' if change_pct > 0 else '📉' if change_pct < 0 else '➡️'
+            })
     
     if comparison_data:
         df_comparison = pd.DataFrame(comparison_data)
         st.dataframe(df_comparison, use_container_width=True)
+    if comparison_errors:
+        st.warning("Symboles sans données: " + ", ".join(f"{s} ({e})" for s, e in comparison_errors.items()))
     
     with st.expander("ℹ️ À propos des indices allemands"):
         st.markdown("""
@@ -1637,101 +2134,78 @@ elif menu == "🇩🇪 Indices DAX, MDAX & SDAX":
 # ============================================================================
 # WATCHLIST ET DERNIÈRE MISE À JOUR
 # ============================================================================
-st.markdown("---")
-col_w1, col_w2 = st.columns([3, 1])
+def format_watchlist_price(price, currency_symbol):
+    """Formate un prix de la watchlist selon la devise"""
+    if currency_symbol == '€':
+        return f"€{price:,.2f}"
+    return f"${price:.2f}"
 
-with col_w1:
-    st.subheader("📋 Watchlist Allemagne")
-    
-    xetra_stocks = [s for s in st.session_state.watchlist if s.endswith('.DE')]
-    frankfurt_stocks = [s for s in st.session_state.watchlist if any(s.endswith(suf) for suf in ['.F', '.BE', '.MU', '.HA', '.DU', '.STU'])]
-    us_stocks = [s for s in st.session_state.watchlist if not any(s.endswith(suf) for suf in ['.DE', '.F', '.BE', '.MU', '.HA', '.DU', '.STU'])]
+def display_watchlist_metrics(stocks, snapshot, currency_symbol, demo_range, use_demo_data=False):
+    """Affiche les cartes de la watchlist à partir du tableau de cotations groupé"""
+    cols_per_row = 4
+    for i in range(0, len(stocks), cols_per_row):
+        cols = st.columns(min(cols_per_row, len(stocks) - i))
+        for j, sym in enumerate(stocks[i:i+cols_per_row]):
+            with cols[j]:
+                if st.session_state.demo_mode:
+                    if use_demo_data and sym in DEMO_DATA:
+                        price = DEMO_DATA[sym]['current_price']
+                        prev_close = DEMO_DATA[sym]['previous_close']
+                        change = ((price - prev_close) / prev_close * 100)
+                        st.metric(sym, format_watchlist_price(price, currency_symbol), delta=f"{change:.1f}%")
+                    else:
+                        price = random.uniform(*demo_range)
+                        st.metric(sym, format_watchlist_price(price, currency_symbol), delta=f"{random.uniform(-2, 2):.1f}%")
+                elif sym in snapshot.index:
+                    row = snapshot.loc[sym]
+                    st.metric(sym, format_watchlist_price(row['price'], currency_symbol), delta=f"{row['change_pct']:.1f}%")
+                else:
+                    st.metric(sym, "N/A")
+
+@st.fragment(run_every=live_refresh)
+def display_watchlist(watchlist):
+    """Cartes de la watchlist, rafraîchies indépendamment du reste de la page"""
+    check_market_phase()
+    xetra_stocks = [s for s in watchlist if s.endswith('.DE')]
+    frankfurt_stocks = [s for s in watchlist if any(s.endswith(suf) for suf in ['.F', '.BE', '.MU', '.HA', '.DU', '.STU'])]
+    us_stocks = [s for s in watchlist if not any(s.endswith(suf) for suf in ['.DE', '.F', '.BE', '.MU', '.HA', '.DU', '.STU'])]
     
     tabs = st.tabs(["Xetra (DE)", "Régional (F, BE...)", "ADR US"])
     
+    # Un seul tableau de cotations pour toute la watchlist
+    if st.session_state.demo_mode:
+        watchlist_snapshot = pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+    else:
+        watchlist_snapshot = load_quote_snapshot(
+            tuple(watchlist),
+            max_age=cache_max_age(live_refresh or 60, symbols=watchlist)
+        )
+    
     with tabs[0]:
         if xetra_stocks:
-            cols_per_row = 4
-            for i in range(0, len(xetra_stocks), cols_per_row):
-                cols = st.columns(min(cols_per_row, len(xetra_stocks) - i))
-                for j, sym in enumerate(xetra_stocks[i:i+cols_per_row]):
-                    with cols[j]:
-                        try:
-                            if st.session_state.demo_mode and sym in DEMO_DATA:
-                                price = DEMO_DATA[sym]['current_price']
-                                prev_close = DEMO_DATA[sym]['previous_close']
-                                change = ((price - prev_close) / prev_close * 100)
-                                st.metric(sym, f"€{price:,.2f}", delta=f"{change:.1f}%")
-                            else:
-                                ticker = yf.Ticker(sym)
-                                hist = ticker.history(period='1d')
-                                if not hist.empty:
-                                    price = hist['Close'].iloc[-1]
-                                    prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else price
-                                    change = ((price - prev_close) / prev_close * 100)
-                                    st.metric(sym, f"€{price:,.2f}", delta=f"{change:.1f}%")
-                                else:
-                                    st.metric(sym, "N/A")
-                        except:
-                            price = random.uniform(20, 200)
-                            st.metric(sym, f"€{price:,.2f}*", delta="0%")
+            display_watchlist_metrics(xetra_stocks, watchlist_snapshot, '€', (20, 200), use_demo_data=True)
         else:
             st.info("Aucune action Xetra")
     
     with tabs[1]:
         if frankfurt_stocks:
-            cols_per_row = 4
-            for i in range(0, len(frankfurt_stocks), cols_per_row):
-                cols = st.columns(min(cols_per_row, len(frankfurt_stocks) - i))
-                for j, sym in enumerate(frankfurt_stocks[i:i+cols_per_row]):
-                    with cols[j]:
-                        try:
-                            if st.session_state.demo_mode:
-                                price = random.uniform(20, 200)
-                                st.metric(sym, f"€{price:,.2f}", delta=f"{random.uniform(-2, 2):.1f}%")
-                            else:
-                                ticker = yf.Ticker(sym)
-                                hist = ticker.history(period='1d')
-                                if not hist.empty:
-                                    price = hist['Close'].iloc[-1]
-                                    prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else price
-                                    change = ((price - prev_close) / prev_close * 100)
-                                    st.metric(sym, f"€{price:,.2f}", delta=f"{change:.1f}%")
-                                else:
-                                    st.metric(sym, "N/A")
-                        except:
-                            price = random.uniform(20, 200)
-                            st.metric(sym, f"€{price:,.2f}*", delta="0%")
+            display_watchlist_metrics(frankfurt_stocks, watchlist_snapshot, '€', (20, 200))
         else:
             st.info("Aucune action régionale")
     
     with tabs[2]:
         if us_stocks:
-            cols_per_row = 4
-            for i in range(0, len(us_stocks), cols_per_row):
-                cols = st.columns(min(cols_per_row, len(us_stocks) - i))
-                for j, sym in enumerate(us_stocks[i:i+cols_per_row]):
-                    with cols[j]:
-                        try:
-                            if st.session_state.demo_mode:
-                                price = random.uniform(10, 100)
-                                st.metric(sym, f"${price:.2f}", delta=f"{random.uniform(-3, 3):.1f}%")
-                            else:
-                                ticker = yf.Ticker(sym)
-                                hist = ticker.history(period='1d')
-                                if not hist.empty:
-                                    price = hist['Close'].iloc[-1]
-                                    prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else price
-                                    change = ((price - prev_close) / prev_close * 100)
-                                    st.metric(sym, f"${price:.2f}", delta=f"{change:.1f}%")
-                                else:
-                                    st.metric(sym, "N/A")
-                        except:
-                            price = random.uniform(10, 100)
-                            st.metric(sym, f"${price:.2f}*", delta="0%")
+            display_watchlist_metrics(us_stocks, watchlist_snapshot, '$', (10, 100))
         else:
             st.info("Aucune action US")
 
+st.markdown("---")
+col_w1, col_w2 = st.columns([3, 1])
+
+with col_w1:
+    st.subheader("📋 Watchlist Allemagne")
+    display_watchlist(list(st.session_state.watchlist))
+
 with col_w2:
     paris_time = datetime.now(USER_TIMEZONE)
     germany_time = datetime.now(GERMANY_TIMEZONE)
@@ -1748,10 +2222,6 @@ with col_w2:
         st.caption("🎮 Mode démonstration")
     else:
         st.caption(f"Dernière MAJ: {paris_time.strftime('%H:%M:%S')}")
-    
-    if auto_refresh and hist is not None and not hist.empty:
-        time.sleep(refresh_rate)
-        st.rerun()
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,213 @@
+"""Démon de surveillance des alertes de prix, indépendant des sessions du navigateur
+
+Lancement:
+    STOCK_TRACKER_SMTP_SERVER=smtp.example.com STOCK_TRACKER_SMTP_USER=alertes@example.com \
+    STOCK_TRACKER_SMTP_PASSWORD=... python alert_daemon.py [--interval 60] [--once]
+
+Le démon lit les alertes enregistrées par le tableau de bord pour chaque propriétaire
+(email vérifié du compte connecté), interroge les cours de tous les symboles en un seul
+instantané (requêtes parallèles) au rythme du calendrier Xetra et envoie chaque notification une seule fois,
+à son propriétaire, depuis le compte SMTP configuré par l'environnement. Tant qu'il
+tourne avec un compte d'envoi, les sessions Streamlit dont les alertes sont
+enregistrées n'envoient plus d'emails elles-mêmes.
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+
+import pytz
+
+from alert_store import AlertStore
+from alerts import AlertIndex, AlertTracker, alert_email
+from market_calendar import follows_xetra, poll_interval
+from market_data import fetch_snapshot
+from notifications import EmailDispatcher
+
+# Intervalle d'interrogation pendant la séance (secondes)
+DEFAULT_INTERVAL = 60
+
+# Fréquence de relecture des alertes et du signal de vie
+TICK_SECONDS = 30
+
+# Les symboles hors Xetra (US...) sont encore interrogés à ce rythme marché Xetra fermé
+OFF_HOURS_INTERVAL = 15 * 60
+
+# Une session considère le démon actif si son signal de vie date de moins de ce délai
+DAEMON_STALE_AFTER = 3 * TICK_SECONDS
+
+# Compte SMTP d'envoi du démon (variables d'environnement)
+SMTP_SERVER_ENV = 'STOCK_TRACKER_SMTP_SERVER'
+SMTP_PORT_ENV = 'STOCK_TRACKER_SMTP_PORT'
+SMTP_USER_ENV = 'STOCK_TRACKER_SMTP_USER'
+SMTP_PASSWORD_ENV = 'STOCK_TRACKER_SMTP_PASSWORD'
+
+USER_TIMEZONE = pytz.timezone('Europe/Paris')
+
+EUR_SUFFIXES = ('.DE', '.F', '.BE', '.MU', '.HA', '.DU', '.STU')
+
+logger = logging.getLogger('alert_daemon')
+
+
+def format_price(value, symbol):
+    """Montant avec le symbole de la devise de cotation"""
+    currency = '€' if symbol.endswith(EUR_SUFFIXES) else '$'
+    return f"{currency}{value:,.2f}"
+
+
+def sender_config():
+    """Compte SMTP d'envoi lu dans l'environnement (None s'il n'est pas configuré)"""
+    server = os.environ.get(SMTP_SERVER_ENV)
+    user = os.environ.get(SMTP_USER_ENV)
+    if not server or not user:
+        return None
+    return {
+        'smtp_server': server,
+        'smtp_port': int(os.environ.get(SMTP_PORT_ENV, 587)),
+        'email': user,
+        'password': os.environ.get(SMTP_PASSWORD_ENV, '')
+    }
+
+
+def next_poll_delay(symbols, base_seconds, now=None):
+    """Délai avant la prochaine interrogation selon le calendrier de marché"""
+    delay = poll_interval(base_seconds, now)
+    if not follows_xetra(symbols):
+        delay = min(delay, max(base_seconds, OFF_HOURS_INTERVAL))
+    return delay
+
+
+class AlertDaemon:
+    """Boucle de surveillance: relecture des alertes, cours groupés, notifications par propriétaire"""
+
+    def __init__(self, store=None, interval=DEFAULT_INTERVAL, fetch=fetch_snapshot, digest_window=0):
+        self.store = store or AlertStore()
+        self.interval = interval
+        self.fetch = fetch
+        self.digest_window = digest_window
+        self.owners = {}
+        self.indexes = {}
+        self.trackers = {}
+        self.version = None
+        self.next_poll = 0.0
+        self.pending = []
+        self._dispatcher = None
+        self._dispatcher_key = None
+
+    @property
+    def symbols(self):
+        return sorted({s for index in self.indexes.values() for s in index.symbols})
+
+    @property
+    def alert_count(self):
+        return sum(len(index) for index in self.indexes.values())
+
+    def _set_alerts(self, owner, alerts):
+        self.owners[owner]['alerts'] = alerts
+        self.indexes[owner] = AlertIndex(alerts)
+        self.trackers.setdefault(owner, AlertTracker()).prune(alerts)
+
+    def reload(self):
+        """Relit les alertes si un fichier a changé; renvoie True en cas de changement"""
+        version = self.store.snapshot_version()
+        if version == self.version:
+            return False
+        self.version = version
+        self.owners = self.store.load_all()
+        self.indexes = {}
+        self.trackers = {owner: t for owner, t in self.trackers.items() if owner in self.owners}
+        for owner, data in self.owners.items():
+            self._set_alerts(owner, data['alerts'])
+        logger.info("%d alerte(s) chargée(s) pour %d propriétaire(s)", self.alert_count, len(self.owners))
+        return True
+
+    def dispatcher(self):
+        """File d'envoi email du compte configuré par l'environnement (None si absent)"""
+        config = sender_config()
+        if config is None:
+            return None
+        key = tuple(config.values())
+        if key != self._dispatcher_key:
+            self._dispatcher = EmailDispatcher(
+                config['smtp_server'], config['smtp_port'], config['email'],
+                config['password'], digest_window=self.digest_window
+            )
+            self._dispatcher_key = key
+        return self._dispatcher
+
+    def poll(self):
+        """Évalue toutes les alertes sur un instantané groupé et notifie chaque propriétaire"""
+        symbols = self.symbols
+        if not symbols:
+            return []
+        prices = self.fetch(symbols)['price'].to_dict()
+        when = datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+        dispatcher = None
+        fired = []
+
+        for owner, index in list(self.indexes.items()):
+            notifications = self.trackers[owner].process(index, prices)
+            if not notifications:
+                continue
+            notify = self.owners[owner]['email'].get('enabled', False)
+            dispatcher = dispatcher or (self.dispatcher() if notify else None)
+            for alert, price in notifications:
+                logger.info("Alerte %s %s %s déclenchée à %.2f",
+                            alert['symbol'], alert['condition'], alert['price'], price)
+                if notify and dispatcher is not None:
+                    subject, body = alert_email(alert, price, format_price, when)
+                    self.pending.append(dispatcher.submit(subject, body, owner))
+            fired.extend(notifications)
+
+            one_time = [alert['id'] for alert, _ in notifications if alert.get('one_time', False)]
+            if one_time:
+                alerts, _ = self.store.remove(owner, one_time)
+                self._set_alerts(owner, alerts)
+                self.version = self.store.snapshot_version()
+        return fired
+
+    def step(self, now=None):
+        """Un tour de boucle: interroge les cours si c'est l'heure ou si les alertes ont changé"""
+        now = time.time() if now is None else now
+        self.pending = [f for f in self.pending if not f.done()]
+        changed = self.reload()
+        if changed or now >= self.next_poll:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning("Échec de l'interrogation des cours: %s", e)
+            self.next_poll = now + next_poll_delay(self.symbols, self.interval)
+        self.store.write_heartbeat(
+            alerts=self.alert_count, owners=len(self.owners),
+            sender=sender_config() is not None, next_poll=self.next_poll
+        )
+
+    def run(self):
+        while True:
+            self.step()
+            time.sleep(TICK_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Surveillance des alertes de prix en arrière-plan")
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL,
+                        help="intervalle d'interrogation pendant la séance (secondes)")
+    parser.add_argument('--digest-window', type=int, default=0,
+                        help="regroupe les alertes d'un même destinataire sur cette fenêtre (secondes)")
+    parser.add_argument('--once', action='store_true', help="un seul passage puis arrêt")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    daemon = AlertDaemon(interval=args.interval, digest_window=args.digest_window)
+    if args.once:
+        daemon.step()
+        # Laisse partir les emails en file d'attente avant de quitter
+        for future in daemon.pending:
+            future.result()
+        return
+    daemon.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Persistance des alertes de prix et des réglages email par propriétaire, partagés entre l'interface et le démon"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from bar_store import DEFAULT_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Champs de la configuration email écrits sur disque (jamais le mot de passe)
+EMAIL_FIELDS = ['enabled', 'email', 'digest_window']
+
+
+def owner_key(email):
+    """Propriétaire des alertes: l'email vérifié du compte connecté (st.user), normalisé"""
+    email = (email or '').strip().lower()
+    return email or None
+
+
+class AlertStore:
+    """Un fichier JSON par propriétaire (alertes et réglages email), plus le signal de vie du démon
+
+    Chaque propriétaire (email du compte connecté) ne voit et ne modifie que ses
+    alertes. Les modifications relisent le fichier et le réécrivent sous un verrou
+    de fichier: deux sessions (ou le démon) qui ajoutent ou suppriment des alertes
+    en même temps ne s'écrasent pas. Chaque écriture est atomique (fichier temporaire
+    puis renommage); la date de modification du fichier sert de numéro de version.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = os.path.join(root, 'alerts')
+        self.owners_dir = os.path.join(self.root, 'owners')
+        self._lock = threading.Lock()
+
+    def _owner_path(self, owner):
+        return os.path.join(self.owners_dir, hashlib.sha1(owner.encode('utf-8')).hexdigest() + '.json')
+
+    def _path(self, name):
+        return os.path.join(self.root, name + '.json')
+
+    @staticmethod
+    def _read_file(path, default):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    @staticmethod
+    def _write_file(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    @contextmanager
+    def _locked(self):
+        """Verrou entre threads et, si disponible, entre processus (sessions et démon)"""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, 'alerts.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_owner(self, owner):
+        data = self._read_file(self._owner_path(owner), {})
+        return {'owner': owner, 'alerts': data.get('alerts', []), 'email': data.get('email', {})}
+
+    def _update(self, owner, fn):
+        """Applique fn(données) au fichier du propriétaire sous verrou; renvoie (alertes, version)"""
+        with self._locked():
+            data = self._read_owner(owner)
+            fn(data)
+            self._write_file(self._owner_path(owner), data)
+            return data['alerts'], self.version(owner)
+
+    def version(self, owner):
+        """Version du fichier du propriétaire (None s'il n'existe pas)"""
+        try:
+            return os.stat(self._owner_path(owner)).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self, owner):
+        """Renvoie (alertes du propriétaire, version)"""
+        return self._read_owner(owner)['alerts'], self.version(owner)
+
+    def add(self, owner, alerts):
+        """Ajoute des alertes (un identifiant leur est attribué); renvoie (alertes, version)"""
+        alerts = [dict(a, id=a.get('id') or uuid.uuid4().hex) for a in alerts]
+
+        def apply(data):
+            known = {a.get('id') for a in data['alerts']}
+            data['alerts'].extend(a for a in alerts if a['id'] not in known)
+        return self._update(owner, apply)
+
+    def remove(self, owner, ids):
+        """Supprime les alertes dont l'identifiant est dans `ids`; renvoie (alertes, version)"""
+        ids = set(ids)
+
+        def apply(data):
+            data['alerts'] = [a for a in data['alerts'] if a.get('id') not in ids]
+        return self._update(owner, apply)
+
+    def save_email_config(self, owner, config):
+        """Enregistre les réglages email du propriétaire, sans identifiants SMTP"""
+        def apply(data):
+            data['email'] = {k: config[k] for k in EMAIL_FIELDS if k in config}
+        self._update(owner, apply)
+
+    def snapshot_version(self):
+        """Version de l'ensemble des fichiers (le démon relit tout si elle change)"""
+        try:
+            entries = os.scandir(self.owners_dir)
+        except OSError:
+            return None
+        with entries:
+            return tuple(sorted((e.name, e.stat().st_mtime_ns) for e in entries if e.name.endswith('.json')))
+
+    def load_all(self):
+        """Renvoie {propriétaire: {'alerts': [...], 'email': {...}}} pour tous les propriétaires"""
+        owners = {}
+        try:
+            names = os.listdir(self.owners_dir)
+        except OSError:
+            return owners
+        for name in names:
+            if name.endswith('.json'):
+                data = self._read_file(os.path.join(self.owners_dir, name), {})
+                if data.get('owner'):
+                    owners[data['owner']] = {'alerts': data.get('alerts', []), 'email': data.get('email', {})}
+        return owners
+
+    def write_heartbeat(self, **info):
+        """Signal de vie du démon (horodatage et informations de suivi)"""
+        self._write_file(self._path('daemon'), dict(info, time=time.time(), pid=os.getpid()))
+
+    def daemon_status(self, max_age):
+        """Dernier signal de vie du démon s'il date de moins de `max_age` secondes, sinon None"""
+        heartbeat = self._read_file(self._path('daemon'), None)
+        if heartbeat is None or time.time() - heartbeat.get('time', 0) > max_age:
+            return None
+        return heartbeat
@@ -0,0 +1,160 @@
+"""Index des alertes de prix: seuils triés par symbole, évaluation par recherche dichotomique"""
+import time
+from bisect import bisect_left, bisect_right
+
+# Écart (en % du seuil) à repasser dans l'autre sens pour réarmer une alerte
+DEFAULT_HYSTERESIS_PCT = 1.0
+
+# Délai minimal (secondes) entre deux notifications d'une même alerte
+DEFAULT_COOLDOWN = 15 * 60
+
+
+class AlertIndex:
+    """Alertes regroupées par symbole, seuils 'above' et 'below' triés
+
+    Pour un cours donné, les alertes 'above' déclenchées sont celles dont le seuil
+    est <= cours (un préfixe de la liste triée) et les alertes 'below' celles dont
+    le seuil est >= cours (un suffixe): une recherche dichotomique suffit.
+    """
+
+    def __init__(self, alerts):
+        self._above = {}
+        self._below = {}
+        for alert in alerts:
+            side = self._above if alert['condition'] == 'above' else self._below
+            side.setdefault(alert['symbol'], []).append(alert)
+
+        self._above_prices = {}
+        self._below_prices = {}
+        for side, prices in [(self._above, self._above_prices), (self._below, self._below_prices)]:
+            for sym, side_alerts in side.items():
+                side_alerts.sort(key=lambda a: a['price'])
+                prices[sym] = [a['price'] for a in side_alerts]
+
+    @property
+    def symbols(self):
+        """Symboles ayant au moins une alerte"""
+        return sorted(set(self._above) | set(self._below))
+
+    def __len__(self):
+        return sum(len(a) for a in self._above.values()) + sum(len(a) for a in self._below.values())
+
+    def triggered(self, symbol, price):
+        """Alertes du symbole déclenchées par ce cours"""
+        result = []
+        if symbol in self._above:
+            k = bisect_right(self._above_prices[symbol], price)
+            result.extend(self._above[symbol][:k])
+        if symbol in self._below:
+            k = bisect_left(self._below_prices[symbol], price)
+            result.extend(self._below[symbol][k:])
+        return result
+
+    def evaluate(self, prices):
+        """Évalue toutes les alertes contre un tableau de cours {symbole: prix}
+
+        Renvoie une liste de tuples (alerte, prix).
+        """
+        fired = []
+        for sym in self.symbols:
+            price = prices.get(sym)
+            if price is None or price != price or price <= 0:
+                continue
+            fired.extend((alert, price) for alert in self.triggered(sym, price))
+        return fired
+
+
+def alert_key(alert):
+    """Identifiant stable d'une alerte (les alertes sont de simples dicts)"""
+    return (alert['symbol'], alert['condition'], float(alert['price']), alert.get('created'))
+
+
+def _signature(alert):
+    """Contenu d'une notification: deux alertes identiques ne notifient qu'une fois"""
+    return (alert['symbol'], alert['condition'], float(alert['price']))
+
+
+def is_rearmed(alert, price):
+    """Le cours est-il repassé de l'autre côté du seuil, au-delà de la bande d'hystérésis?"""
+    band = float(alert.get('hysteresis', DEFAULT_HYSTERESIS_PCT)) / 100
+    if alert['condition'] == 'above':
+        return price < alert['price'] * (1 - band)
+    return price > alert['price'] * (1 + band)
+
+
+def alert_email(alert, price, format_price, when):
+    """Sujet et corps HTML de la notification d'une alerte déclenchée
+
+    `format_price(valeur, symbole)` met en forme les montants, `when` est l'heure affichée.
+    """
+    symbol = alert['symbol']
+    subject = f"🚨 Alerte prix - {symbol}"
+    body = f"""
+            <h2>Alerte de prix déclenchée</h2>
+            <p><b>Symbole:</b> {symbol}</p>
+            <p><b>Prix actuel:</b> {format_price(price, symbol)}</p>
+            <p><b>Condition:</b> {alert['condition']} {format_price(alert['price'], symbol)}</p>
+            <p><b>Date:</b> {when} (heure Paris)</p>
+            """
+    return subject, body
+
+
+class AlertTracker:
+    """Machine à états des alertes, déclenchement sur front et non sur niveau
+
+    - armée: la condition devient vraie -> notification, l'alerte passe à 'déclenchée';
+    - déclenchée: aucune nouvelle notification tant que le cours n'est pas repassé
+      de l'autre côté du seuil d'au moins la bande d'hystérésis (réarmement);
+    - une alerte réarmée ne notifie pas de nouveau avant la fin de son délai de
+      carence (`cooldown`, en secondes), et les notifications identiques (même
+      symbole, condition et seuil) sont dédupliquées sur ce même délai.
+    """
+
+    def __init__(self, cooldown=DEFAULT_COOLDOWN):
+        self.cooldown = cooldown
+        self._fired = {}
+        self._last_fired = {}
+        self._sent = {}
+
+    def state(self, alert):
+        """'fired' si l'alerte attend son réarmement, 'armed' sinon"""
+        return 'fired' if alert_key(alert) in self._fired else 'armed'
+
+    def prune(self, alerts):
+        """Oublie l'état des alertes supprimées"""
+        keys = {alert_key(a) for a in alerts}
+        self._fired = {k: v for k, v in self._fired.items() if k in keys}
+        self._last_fired = {k: v for k, v in self._last_fired.items() if k in keys}
+
+    def process(self, index, prices, now=None):
+        """Met à jour les états et renvoie les notifications à envoyer [(alerte, prix)]"""
+        now = time.time() if now is None else now
+
+        # Réarmement des alertes déclenchées dont le cours est revenu
+        for key, alert in list(self._fired.items()):
+            price = prices.get(alert['symbol'])
+            if price is not None and price == price and price > 0 and is_rearmed(alert, price):
+                del self._fired[key]
+
+        notifications = []
+        for alert, price in index.evaluate(prices):
+            key = alert_key(alert)
+            if key in self._fired:
+                continue
+            cooldown = float(alert.get('cooldown', self.cooldown))
+            if now - self._last_fired.get(key, float('-inf')) < cooldown:
+                continue
+
+            self._fired[key] = alert
+            self._last_fired[key] = now
+
+            signature = _signature(alert)
+            sent = self._sent.get(signature)
+            if sent is not None and now - sent[0] < sent[1]:
+                continue
+            self._sent[signature] = (now, cooldown)
+            notifications.append((alert, price))
+
+        # Les signatures expirées ne servent plus à la déduplication
+        self._sent = {s: (t, c) for s, (t, c) in self._sent.items() if now - t < c}
+        return notifications
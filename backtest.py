@@ -0,0 +1,239 @@
+"""Backtest walk-forward et validation croisée temporelle des modèles de prédiction"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from forecasting import STACK_MAX_CELLS, prediction_inputs, stacked_lstsq, stacked_polyval
+
+# En dessous de ce volume (fenêtres x barres d'apprentissage x paramétrages), le calcul
+# reste dans le processus courant: démarrer des processus coûterait plus que les ajustements
+POOL_MIN_CELLS = 1_000_000
+
+BACKTEST_COLUMNS = ['mae', 'rmse', 'mape', 'hit_rate', 'windows']
+
+
+# Configurations comparées par la sélection automatique: régression polynomiale
+# simple et régularisée (ridge), qui limite l'emballement des degrés élevés
+SELECTION_CANDIDATES = (
+    [{'degree': d} for d in range(1, 6)]
+    + [{'degree': d, 'alpha': a} for d in (3, 4, 5) for a in (0.1, 1.0)]
+)
+
+
+def polynomial_forecasts(days, closes, origins, starts, target_days, degree, alpha=0.0,
+                         max_cells=STACK_MAX_CELLS, features=None):
+    """Prévisions de toutes les fenêtres (un ajustement polynomial par fenêtre)
+
+    La fenêtre i apprend sur les barres [starts[i], origins[i]) et prédit aux
+    jours target_days[i]. Les fenêtres sont résolues par paquets empilés d'au plus
+    `max_cells` cellules (fenêtres x barres x coefficients), ce qui borne la mémoire
+    quelle que soit la longueur de l'historique. Les variables explicatives sont
+    ignorées. Renvoie un tableau fenêtres x horizons.
+    """
+    lengths = origins - starts
+    forecasts = np.empty(target_days.shape)
+    first = 0
+    while first < len(origins):
+        # Taille du paquet: (nombre de fenêtres) x (plus longue fenêtre du paquet) x coefficients
+        cells = np.arange(1, len(origins) - first + 1) * np.maximum.accumulate(lengths[first:]) * (degree + 1)
+        last = first + max(1, int(np.searchsorted(cells, max_cells, side='right')))
+        chunk = slice(first, last)
+        train_days = [days[s:o] for s, o in zip(starts[chunk], origins[chunk])]
+        train_closes = [closes[s:o] for s, o in zip(starts[chunk], origins[chunk])]
+        coef, scale, _, _, _ = stacked_lstsq(train_days, train_closes, degree, alpha)
+        forecasts[chunk] = stacked_polyval(coef, scale, target_days[chunk])
+        first = last
+    return forecasts
+
+
+def feature_ridge_forecasts(days, closes, origins, starts, target_days, alpha=1.0,
+                            max_cells=STACK_MAX_CELLS, features=None):
+    """Prévisions d'une régression ridge des rendements futurs sur les variables explicatives
+
+    `features` est la matrice barres x variables (FEATURE_COLUMNS) alignée sur `closes`.
+    Pour l'horizon h, la fenêtre i apprend le rendement log(close[t + h] / close[t]) sur
+    les barres t de [starts[i], origins[i] - h), toutes connues à l'origine, puis l'applique
+    aux variables de la dernière barre de la fenêtre. Les sommes X'X et X'y de toutes les
+    fenêtres sont des différences de sommes cumulées: un seul passage sur l'historique par
+    horizon, quel que soit le nombre de fenêtres (`max_cells` est sans objet). La pénalité
+    équivaut à Ridge(alpha) sur variables centrées réduites, constante non pénalisée.
+    Renvoie un tableau fenêtres x horizons.
+    """
+    if features is None:
+        raise ValueError("Le modèle 'feature_ridge' demande la matrice des variables explicatives")
+    # Variables absentes de tout l'historique (indice de référence indisponible...) écartées
+    features = features[:, ~np.isnan(features).all(axis=0)]
+    n_bars = len(closes)
+    X = np.column_stack([np.ones(n_bars), features])
+    # Les barres aux variables incomplètes (début d'historique) ne comptent pas dans les sommes
+    X = np.where(np.isfinite(X).all(axis=1)[:, None], X, 0.0)
+    n_coef = X.shape[1]
+    gram = np.concatenate([np.zeros((1, n_coef, n_coef)), np.cumsum(X[:, :, None] * X[:, None, :], axis=0)])
+    log_close = np.log(closes)
+    last = origins - 1
+    features_idx = np.arange(1, n_coef)
+
+    forecasts = np.empty(target_days.shape)
+    for h in range(1, target_days.shape[1] + 1):
+        y = np.zeros(n_bars)
+        y[:n_bars - h] = log_close[h:] - log_close[:n_bars - h]
+        xy = np.concatenate([np.zeros((1, n_coef)), np.cumsum(X * y[:, None], axis=0)])
+        ends = np.maximum(origins - h, starts)
+        G = gram[ends] - gram[starts]
+        b = xy[ends] - xy[starts]
+
+        # Variance de chaque variable sur la fenêtre: la pénalité alpha * variance sur le
+        # coefficient brut est celle de Ridge(alpha) sur la variable réduite
+        count = np.maximum(G[:, 0, 0], 1.0)
+        mean = G[:, 0, 1:] / count[:, None]
+        variance = np.maximum(G[:, features_idx, features_idx] / count[:, None] - mean ** 2, 0.0)
+        G[:, features_idx, features_idx] += alpha * variance
+
+        # Fenêtre sans barre complète: matrice nulle, solution de norme minimale (rendement nul)
+        coef = np.einsum('wkn,wn->wk', np.linalg.pinv(G), b)
+        forecasts[:, h - 1] = closes[last] * np.exp(np.einsum('wk,wk->w', X[last], coef))
+    return forecasts
+
+
+# Modèles testables: nom -> fonction(days, closes, origins, starts, target_days,
+# max_cells, features, **params) renvoyant les prévisions (fenêtres x horizons) de toutes les fenêtres
+BACKTEST_MODELS = {
+    'polynomial': polynomial_forecasts,
+    'feature_ridge': feature_ridge_forecasts,
+}
+
+# Paramétrages de la régression sur variables comparés par le backtest
+FEATURE_RIDGE_GRID = [{'alpha': a} for a in (1.0, 10.0, 100.0)]
+
+
+def walk_forward_windows(n_bars, horizon, min_train, window=None, step=1):
+    """Origines et débuts des fenêtres d'apprentissage
+
+    window=None: fenêtres croissantes (depuis la première barre); sinon fenêtres
+    glissantes de `window` barres. Chaque origine laisse `horizon` barres à prédire.
+    """
+    origins = np.arange(max(min_train, window or 0), n_bars - horizon + 1, step)
+    starts = np.zeros_like(origins) if window is None else origins - window
+    return origins, starts
+
+
+def _run_task(args):
+    """Prévisions d'un modèle pour un paramétrage (exécuté dans un processus séparé)"""
+    model, days, closes, origins, starts, target_days, params, max_cells, features = args
+    return BACKTEST_MODELS[model](days, closes, origins, starts, target_days, max_cells=max_cells,
+                                  features=features, **params)
+
+
+def score_forecasts(predicted, actual, reference):
+    """Erreurs par horizon (colonnes), calculées sur toutes les fenêtres en une fois
+
+    `reference` est le dernier cours connu de chaque fenêtre, pour le taux de bonne direction.
+    """
+    errors = predicted - actual
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mape = np.nanmean(np.abs(errors / actual), axis=0) * 100
+    hits = np.sign(predicted - reference[:, None]) == np.sign(actual - reference[:, None])
+    return pd.DataFrame({
+        'mae': np.mean(np.abs(errors), axis=0),
+        'rmse': np.sqrt(np.mean(errors ** 2, axis=0)),
+        'mape': mape,
+        'hit_rate': np.mean(hits, axis=0) * 100,
+        'windows': len(predicted)
+    }, index=pd.RangeIndex(1, predicted.shape[1] + 1, name='horizon'))
+
+
+def params_label(params):
+    """Libellé lisible d'un paramétrage, par exemple 'degree=3, alpha=0.1'"""
+    return ', '.join(f"{k}={v}" for k, v in params.items())
+
+
+def _forecast_windows(closes, days, origins, starts, horizon, param_grid, model, max_workers, features=None):
+    """Prévisions (fenêtres x horizons) de chaque paramétrage, réparties sur des processus si besoin"""
+    targets = origins[:, None] + np.arange(horizon)[None, :]
+    cells = len(origins) * int(np.max(origins - starts)) * len(param_grid)
+    if max_workers == 1 or len(param_grid) == 1 or cells < POOL_MIN_CELLS:
+        workers = 1
+    else:
+        workers = min(max_workers or os.cpu_count() or 1, len(param_grid))
+    # Le budget mémoire des paquets empilés est partagé entre les processus simultanés
+    tasks = [(model, days, closes, origins, starts, days[targets], params, STACK_MAX_CELLS // workers, features)
+             for params in param_grid]
+    if workers == 1:
+        forecasts = [_run_task(task) for task in tasks]
+    else:
+        # forkserver: pas de fork du serveur Streamlit multi-thread (verrous hérités dans un état incohérent)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('forkserver')) as pool:
+            forecasts = list(pool.map(_run_task, tasks))
+    return forecasts, closes[targets]
+
+
+def walk_forward(hist, param_grid, horizon=5, min_train=60, window=None, step=1,
+                 model='polynomial', max_workers=None, features=None):
+    """Backtest walk-forward d'un modèle pour chaque paramétrage de `param_grid`
+
+    Pour chaque origine, le modèle est réajusté sur la fenêtre d'apprentissage et
+    prédit les `horizon` barres suivantes, jamais vues à l'ajustement.
+    `param_grid` est une liste de dicts (par exemple [{'degree': 1}, ..., {'degree': 5}]);
+    les paramétrages sont répartis sur un pool de processus si le calcul est lourd.
+    `features` (DataFrame aligné sur hist.index, par exemple FeatureStore.compute) est
+    transmis aux modèles qui s'en servent ('feature_ridge').
+    Renvoie un DataFrame indexé par (paramétrage, horizon), colonnes BACKTEST_COLUMNS.
+    """
+    valid = hist['Close'].notna().to_numpy()
+    _, X, closes = prediction_inputs(hist[valid])
+    if features is not None:
+        features = features.to_numpy(dtype=np.float64)[valid]
+    origins, starts = walk_forward_windows(len(closes), horizon, min_train, window, step)
+    if len(origins) == 0:
+        return pd.DataFrame(columns=BACKTEST_COLUMNS)
+
+    forecasts, actual = _forecast_windows(closes, X[:, 0], origins, starts, horizon,
+                                          param_grid, model, max_workers, features)
+    reference = closes[origins - 1]
+    return pd.concat(
+        [score_forecasts(predicted, actual, reference) for predicted in forecasts],
+        keys=[params_label(params) for params in param_grid], names=['params']
+    )
+
+
+def cross_validate(hist, candidates=SELECTION_CANDIDATES, folds=5, test_size=None,
+                   model='polynomial', max_workers=None):
+    """Validation croisée temporelle (plis croissants) de chaque configuration candidate
+
+    Le pli k apprend sur toutes les barres précédant son bloc de test de `test_size`
+    barres (par défaut n / (folds + 1)); les blocs de test se suivent sans se
+    chevaucher et ne précèdent jamais les données d'apprentissage. Les configurations
+    dont le degré dépasse ce que le plus petit pli peut déterminer (degré + 1 jours
+    distincts, critère des données intrajournalières) sont écartées.
+    Renvoie (tableau trié par RMSE moyen avec le RMSE de chaque pli, meilleure configuration).
+    """
+    _, X, closes = prediction_inputs(hist[hist['Close'].notna()])
+    n_bars = len(closes)
+    test_size = test_size or n_bars // (folds + 1)
+    min_train = n_bars - folds * test_size
+    if test_size < 1 or min_train < 2:
+        return pd.DataFrame(columns=['rmse', 'rmse_std', 'mae']), None
+
+    distinct_days = len(np.unique(X[:min_train, 0]))
+    candidates = [params for params in candidates if params['degree'] + 1 <= distinct_days]
+    if not candidates:
+        return pd.DataFrame(columns=['rmse', 'rmse_std', 'mae']), None
+
+    origins, starts = walk_forward_windows(n_bars, test_size, min_train, None, test_size)
+    forecasts, actual = _forecast_windows(closes, X[:, 0], origins, starts, test_size,
+                                          candidates, model, max_workers)
+
+    rows = []
+    for params, predicted in zip(candidates, forecasts):
+        errors = predicted - actual
+        fold_rmse = np.sqrt(np.mean(errors ** 2, axis=1))
+        row = {'rmse': fold_rmse.mean(), 'rmse_std': fold_rmse.std(), 'mae': np.mean(np.abs(errors))}
+        row.update({f"pli {k + 1}": v for k, v in enumerate(fold_rmse)})
+        rows.append(row)
+
+    table = pd.DataFrame(rows, index=pd.Index([params_label(p) for p in candidates], name='params'))
+    best = candidates[int(np.argmin(table['rmse'].to_numpy()))]
+    return table.sort_values('rmse'), best
@@ -0,0 +1,173 @@
+"""Stockage local et incrémental des historiques OHLCV (un fichier Parquet par symbole/intervalle)"""
+import json
+import os
+import re
+import threading
+
+import pandas as pd
+
+# Répertoire du cache disque (surchargeable par variable d'environnement)
+DEFAULT_CACHE_DIR = os.environ.get(
+    'STOCK_TRACKER_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_cache')
+)
+
+# Périodes yfinance de la plus courte à la plus longue
+PERIOD_ORDER = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "max"]
+
+# Intervalles intrajournaliers yfinance (historique limité à quelques jours ou semaines)
+INTRADAY_INTERVALS = ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"]
+
+# Ancienneté maximale des barres intrajournalières servies par Yahoo: au-delà, une
+# requête par date de début revient vide
+INTRADAY_LOOKBACK = {
+    '1m': pd.Timedelta(days=8),
+    '2m': pd.Timedelta(days=60),
+    '5m': pd.Timedelta(days=60),
+    '15m': pd.Timedelta(days=60),
+    '30m': pd.Timedelta(days=60),
+    '90m': pd.Timedelta(days=60),
+    '60m': pd.Timedelta(days=730),
+    '1h': pd.Timedelta(days=730),
+}
+
+
+def period_rank(period):
+    """Rang d'une période dans PERIOD_ORDER (les périodes inconnues valent 'max')"""
+    return PERIOD_ORDER.index(period) if period in PERIOD_ORDER else len(PERIOD_ORDER) - 1
+
+
+def stale(bars):
+    """Marque un historique comme périmé (servi depuis le disque faute de réponse de Yahoo)"""
+    bars.attrs['stale'] = True
+    return bars
+
+
+def slice_period(df, period):
+    """Restreint un historique à la période demandée, relativement à la dernière barre"""
+    if df is None or df.empty or period == 'max' or period not in PERIOD_ORDER:
+        return df
+
+    if period.endswith('d'):
+        # '1d' et '5d' sont des jours de bourse, pas des jours calendaires
+        days = int(period[:-1])
+        dates = df.index.normalize()
+        kept = dates.unique()[-days:]
+        return df[dates.isin(kept)]
+
+    if period.endswith('mo'):
+        offset = pd.DateOffset(months=int(period[:-2]))
+    else:
+        offset = pd.DateOffset(years=int(period[:-1]))
+    return df[df.index > df.index[-1] - offset]
+
+
+class BarStore:
+    """Cache disque des barres OHLCV, clé (symbole, intervalle)
+
+    Chaque clé est stockée dans un fichier Parquet accompagné d'un petit fichier JSON
+    qui indique la plus longue période déjà téléchargée en entier.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = os.path.join(root, 'bars')
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _paths(self, symbol, interval):
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', f"{symbol}__{interval}")
+        base = os.path.join(self.root, name)
+        return base + '.parquet', base + '.json'
+
+    def load(self, symbol, interval):
+        """Renvoie (barres, métadonnées) ou (None, {}) si rien n'est stocké"""
+        data_path, meta_path = self._paths(symbol, interval)
+        if not os.path.exists(data_path):
+            return None, {}
+        try:
+            bars = pd.read_parquet(data_path)
+            meta = {}
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            return bars, meta
+        except Exception:
+            return None, {}
+
+    def save(self, symbol, interval, bars, meta):
+        """Écrit les barres de manière atomique (fichier temporaire puis renommage)"""
+        os.makedirs(self.root, exist_ok=True)
+        data_path, meta_path = self._paths(symbol, interval)
+        bars.to_parquet(data_path + '.tmp')
+        os.replace(data_path + '.tmp', data_path)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @staticmethod
+    def merge(stored, fresh):
+        """Fusionne deux historiques; les barres récentes remplacent les anciennes"""
+        if stored is None or stored.empty:
+            return fresh
+        if fresh is None or fresh.empty:
+            return stored
+        if fresh.index.tz is not None and stored.index.tz is not None:
+            fresh = fresh.tz_convert(stored.index.tz)
+        merged = pd.concat([stored, fresh[stored.columns.intersection(fresh.columns)]])
+        merged = merged[~merged.index.duplicated(keep='last')]
+        return merged.sort_index()
+
+    def get_history(self, symbol, period, interval, fetch):
+        """Renvoie l'historique demandé en ne téléchargeant que les barres manquantes
+
+        `fetch(period=...)` ou `fetch(start=...)` doit renvoyer un DataFrame yfinance.
+        Si le cache couvre déjà la période, seules les barres postérieures au dernier
+        horodatage stocké sont demandées; si cette requête échoue (limite de requêtes
+        comprise) ou revient vide, les barres stockées sont renvoyées avec
+        attrs['stale'] = True. La période complète est téléchargée si le cache ne la
+        couvre pas, ou si ses barres sont plus anciennes que l'historique intrajournalier
+        servi par Yahoo (INTRADAY_LOOKBACK). Le fichier n'est réécrit que si des barres
+        ont changé; en intrajournalier il est limité à la période couverte.
+        """
+        with self._lock((symbol, interval)):
+            stored, meta = self.load(symbol, interval)
+            covered = (stored is not None and not stored.empty
+                       and period_rank(meta.get('period', '1d')) >= period_rank(period))
+
+            if covered:
+                try:
+                    # La dernière barre est redemandée: elle peut être incomplète
+                    fresh = fetch(start=stored.index[-1])
+                except Exception:
+                    # Un téléchargement complet aggraverait une limite de requêtes
+                    return stale(slice_period(stored, period))
+                if fresh is None or fresh.empty:
+                    # La dernière barre stockée, redemandée, aurait dû revenir
+                    lookback = INTRADAY_LOOKBACK.get(interval)
+                    if lookback is None or pd.Timestamp.now(tz=stored.index.tz) - stored.index[-1] <= lookback:
+                        return stale(slice_period(stored, period))
+                    covered = False
+
+            if not covered:
+                fresh = fetch(period=period)
+                if fresh is None or fresh.empty:
+                    return fresh
+                if stored is not None and not stored.empty and fresh.index[0] > stored.index[-1]:
+                    # Trou entre le cache et les nouvelles barres: on repart de zéro
+                    stored = None
+                meta = {'period': period}
+
+            merged = self.merge(stored, fresh)
+            if merged is None or merged.empty:
+                return merged
+
+            if interval in INTRADAY_INTERVALS:
+                # Les barres intrajournalières ne sont servies que sur de courtes périodes
+                merged = slice_period(merged, meta['period'])
+            if not covered or not merged.equals(stored):
+                self.save(symbol, interval, merged, meta)
+            return slice_period(merged, period)
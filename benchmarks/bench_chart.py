@@ -0,0 +1,72 @@
+"""Benchmark: graphique principal avec et sans réduction de points / WebGL
+
+Mesure la taille du JSON envoyé au navigateur et le temps de construction +
+sérialisation de la figure côté serveur, sur un historique synthétique.
+Usage: python benchmarks/bench_chart.py [--bars 100000] [--candles]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import build_price_figure
+from indicators import IndicatorEngine
+
+
+def synthetic_history(bars, freq):
+    """Historique OHLCV aléatoire de `bars` barres"""
+    index = pd.date_range(end=pd.Timestamp.now(tz='Europe/Paris'), periods=bars, freq=freq)
+    rng = np.random.default_rng(42)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, bars)))
+    spread = np.abs(rng.normal(0, 0.002, bars)) * close
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.5, bars) * spread,
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(1_000, 100_000, bars)
+    }, index=index)
+
+
+def measure(hist, candles, downsample, repeat):
+    """Renvoie (temps moyen en ms, taille du JSON en octets, points par trace)"""
+    indicators = IndicatorEngine().compute(('bench', 'bench'), hist, intraday=candles)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = build_price_figure(hist, "bench", "Prix (€)", candles=candles,
+                                 indicators=indicators, downsample=downsample)
+        payload = fig.to_json()
+        timings.append(time.perf_counter() - start)
+    points = max(len(trace.x) for trace in fig.data)
+    kinds = sorted({trace.type for trace in fig.data})
+    return np.median(timings) * 1000, len(payload), points, kinds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, default=100_000, help="nombre de barres")
+    parser.add_argument('--candles', action='store_true', help="chandeliers (intraday) au lieu d'une ligne")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    hist = synthetic_history(args.bars, 'min' if args.candles else 'D')
+    print(f"{args.bars} barres, {'chandeliers' if args.candles else 'ligne'}")
+
+    results = {}
+    for label, downsample in [('avant', False), ('après', True)]:
+        elapsed, size, points, kinds = measure(hist, args.candles, downsample, args.repeat)
+        results[label] = (elapsed, size)
+        print(f"  {label:<6} {elapsed:8.1f} ms  {size / 1e6:7.2f} Mo  {points:7d} points/trace  {', '.join(kinds)}")
+
+    print(f"  payload: x{results['avant'][1] / results['après'][1]:.1f} plus petit, "
+          f"construction: x{results['avant'][0] / results['après'][0]:.1f} plus rapide")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark: prévisions de tendance groupées (NumPy empilé) contre une boucle de pipelines sklearn
+
+Historiques journaliers synthétiques de longueurs variables, un par symbole
+(160 symboles par défaut, soit DAX + MDAX + SDAX).
+Usage: python benchmarks/bench_forecast.py [--symbols 160] [--degree 2] [--days 7]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forecasting import FittedModel, batch_forecast, prediction_inputs
+
+
+def synthetic_histories(symbols, seed=42):
+    """Clôtures aléatoires de 100 à 1250 séances par symbole"""
+    rng = np.random.default_rng(seed)
+    histories = {}
+    for i in range(symbols):
+        bars = int(rng.integers(100, 1250))
+        index = pd.bdate_range(end=pd.Timestamp.now(tz='Europe/Paris').normalize(), periods=bars)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, bars)))
+        histories[f"SYM{i:03d}"] = pd.DataFrame({'Close': close}, index=index)
+    return histories
+
+
+def sklearn_loop(histories, degree, days):
+    """Référence: un pipeline sklearn ajusté par symbole"""
+    return {
+        sym: FittedModel(*prediction_inputs(hist)[1:], degree).forecast(days)[-1]
+        for sym, hist in histories.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=160)
+    parser.add_argument('--degree', type=int, default=2)
+    parser.add_argument('--days', type=int, default=7)
+    args = parser.parse_args()
+
+    histories = synthetic_histories(args.symbols)
+    print(f"{args.symbols} symboles, degré {args.degree}, horizon {args.days} jours")
+
+    start = time.perf_counter()
+    reference = sklearn_loop(histories, args.degree, args.days)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = batch_forecast(histories, args.degree, args.days)
+    batch_time = time.perf_counter() - start
+
+    error = max(abs(table.loc[sym, 'predicted'] / value - 1) for sym, value in reference.items())
+    print(f"{'boucle sklearn':>16}: {loop_time * 1000:8.1f} ms")
+    print(f"{'NumPy empilé':>16}: {batch_time * 1000:8.1f} ms  (x{loop_time / batch_time:.1f})")
+    print(f"écart relatif max des prédictions: {error:.1e}")
+
+
+if __name__ == '__main__':
+    main()
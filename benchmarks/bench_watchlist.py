@@ -0,0 +1,90 @@
+"""Benchmark: cotations de la watchlist, boucle par symbole vs requêtes parallèles
+
+Utilise une source de données locale simulée (latence fixe par requête), sans réseau.
+Yahoo ne sert qu'un symbole par requête d'historique: yf.download enchaîne lui aussi
+une requête par symbole, la source simulée compte donc une requête par symbole.
+Usage: python benchmarks/bench_watchlist.py [--latency 0.05] [--symbols 35]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_data import fetch_snapshot
+from rate_limiter import TokenBucketLimiter, yahoo_limiter
+
+
+class StubSource:
+    """Source de données simulée qui compte les requêtes et imite la latence réseau"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.index = pd.date_range(end=pd.Timestamp.now().normalize(), periods=5, freq='D')
+
+    def _closes(self, symbol):
+        rng = np.random.default_rng(abs(hash(symbol)) % (2 ** 32))
+        return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(self.index))))
+
+    def history(self, symbol, period='5d'):
+        """Équivalent de yf.Ticker(symbol).history(period=...): une requête"""
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        return pd.DataFrame({'Close': self._closes(symbol)}, index=self.index)
+
+
+def run_sequential(source, symbols):
+    """Ancien comportement: une requête history() par symbole, l'une après l'autre"""
+    rows = {}
+    for sym in symbols:
+        hist = source.history(sym, period='1d')
+        if not hist.empty:
+            rows[sym] = hist['Close'].iloc[-1]
+    return rows
+
+
+def run_parallel(source, symbols):
+    """Requêtes parallèles, sans limite de débit (borne basse)"""
+    limiter = TokenBucketLimiter(max_rate=1e6, burst=len(symbols))
+    return fetch_snapshot(symbols, history=source.history, limiter=limiter)
+
+
+def run_limited(source, symbols):
+    """Requêtes parallèles soumises à un limiteur réglé comme celui de l'application (seau plein)"""
+    limiter = TokenBucketLimiter(max_rate=yahoo_limiter.max_rate, burst=yahoo_limiter.burst)
+    return fetch_snapshot(symbols, history=source.history, limiter=limiter)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.05, help="latence simulée par requête (s)")
+    parser.add_argument('--symbols', type=int, default=35, help="nombre de symboles")
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i}.DE" for i in range(args.symbols)]
+
+    results = []
+    for name, runner in [('séquentiel', run_sequential), ('parallèle', run_parallel),
+                         ('+ limiteur', run_limited)]:
+        source = StubSource(args.latency)
+        start = time.perf_counter()
+        runner(source, symbols)
+        elapsed = time.perf_counter() - start
+        results.append((name, elapsed, source.requests))
+
+    print(f"{len(symbols)} symboles, latence simulée {args.latency * 1000:.0f} ms/requête")
+    for name, elapsed, requests in results:
+        print(f"  {name:<12} {elapsed * 1000:8.1f} ms  {requests:4d} requêtes"
+              f"  (x{results[0][1] / elapsed:.1f})")
+
+
+if __name__ == '__main__':
+    main()
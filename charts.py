@@ -0,0 +1,103 @@
+"""Construction des graphiques Plotly du tableau de bord"""
+import plotly.graph_objs as go
+
+from downsampling import downsample_history, max_points_for_width, WEBGL_THRESHOLD
+
+# Largeur de référence du graphique principal (use_container_width, layout large)
+CHART_WIDTH_PX = 1400
+
+
+# Indicateurs superposables au prix: colonnes du moteur d'indicateurs et style des traces
+OVERLAY_STYLES = {
+    'SMA 20': [('SMA 20', dict(color='orange', width=1, dash='dash'))],
+    'SMA 50': [('SMA 50', dict(color='purple', width=1, dash='dash'))],
+    'EMA 20': [('EMA 20', dict(color='green', width=1, dash='dot'))],
+    'Bollinger': [
+        ('BB upper', dict(color='gray', width=1, dash='dot')),
+        ('BB lower', dict(color='gray', width=1, dash='dot'))
+    ],
+    'VWAP': [('VWAP', dict(color='#2196f3', width=1))]
+}
+
+DEFAULT_OVERLAYS = ['SMA 20', 'SMA 50']
+
+
+def build_price_figure(hist, title, price_label, candles=False, indicators=None,
+                       overlays=DEFAULT_OVERLAYS, width_px=CHART_WIDTH_PX, downsample=True):
+    """Graphique principal: prix (ligne ou chandeliers), indicateurs superposés et volume
+
+    Les indicateurs (calculés sur l'historique complet par le moteur d'indicateurs)
+    sont réduits avec le prix au budget de points de la largeur du graphique. Au-delà
+    de WEBGL_THRESHOLD points, les lignes passent en Scattergl (rendu WebGL).
+    """
+    chart_hist = hist[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
+    overlay_traces = []
+    if indicators is not None:
+        for overlay in overlays:
+            for column, line in OVERLAY_STYLES.get(overlay, []):
+                if column in indicators.columns and indicators[column].notna().any():
+                    chart_hist[column] = indicators[column]
+                    overlay_traces.append((column, line))
+
+    if downsample:
+        # Un chandelier a besoin de plus de place qu'un point de ligne
+        budget = max_points_for_width(width_px, 0.5 if candles else 2)
+        chart_hist = downsample_history(chart_hist, budget, ohlc=candles)
+
+    scatter = go.Scattergl if downsample and len(chart_hist) > WEBGL_THRESHOLD else go.Scatter
+
+    fig = go.Figure()
+
+    if candles:
+        fig.add_trace(go.Candlestick(
+            x=chart_hist.index,
+            open=chart_hist['Open'],
+            high=chart_hist['High'],
+            low=chart_hist['Low'],
+            close=chart_hist['Close'],
+            name='Prix',
+            increasing_line_color='#000000',
+            decreasing_line_color='#ef553b'
+        ))
+    else:
+        fig.add_trace(scatter(
+            x=chart_hist.index,
+            y=chart_hist['Close'],
+            mode='lines',
+            name='Prix',
+            line=dict(color='#DD0000', width=2)
+        ))
+
+    for column, line in overlay_traces:
+        fig.add_trace(scatter(
+            x=chart_hist.index,
+            y=chart_hist[column],
+            mode='lines',
+            name=column,
+            line=line
+        ))
+
+    fig.add_trace(go.Bar(
+        x=chart_hist.index,
+        y=chart_hist['Volume'],
+        name='Volume',
+        yaxis='y2',
+        marker=dict(color='lightgray', opacity=0.3)
+    ))
+
+    fig.update_layout(
+        title=title,
+        yaxis_title=price_label,
+        yaxis2=dict(
+            title="Volume",
+            overlaying='y',
+            side='right',
+            showgrid=False
+        ),
+        xaxis_title="Date (heure Paris)",
+        height=600,
+        hovermode='x unified',
+        template='plotly_white'
+    )
+
+    return fig
@@ -0,0 +1,118 @@
+"""Réduction du nombre de points envoyés aux graphiques Plotly (LTTB et agrégation OHLC)"""
+import numpy as np
+import pandas as pd
+
+# Points par pixel de largeur au-delà desquels l'œil ne distingue plus rien
+POINTS_PER_PIXEL = 2
+
+# Au-delà de ce nombre de points par trace, on bascule sur les traces WebGL
+WEBGL_THRESHOLD = 1000
+
+
+def max_points_for_width(width_px, points_per_pixel=POINTS_PER_PIXEL):
+    """Budget de points par trace pour un graphique de `width_px` pixels"""
+    return max(int(width_px * points_per_pixel), 3)
+
+
+def lttb_indices(x, y, n_out):
+    """Indices retenus par l'algorithme Largest-Triangle-Three-Buckets
+
+    x et y sont des tableaux NumPy de même longueur; le premier et le dernier
+    point sont toujours conservés.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # Sommet moyen du bucket suivant
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Aire du triangle (point retenu précédent, candidat, moyenne suivante)
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def _bucket_starts(n, n_out):
+    """Début de chacun des n_out buckets contigus couvrant n barres"""
+    return np.unique(np.arange(n_out) * n // n_out)
+
+
+def ohlc_buckets(df, n_out):
+    """Agrège un historique OHLCV en au plus n_out barres sans perdre les extrêmes
+
+    Chaque bucket garde l'ouverture de la première barre, le plus haut et le plus
+    bas du bucket, la clôture de la dernière barre et la somme des volumes. Les
+    autres colonnes (moyennes mobiles...) prennent la dernière valeur du bucket.
+    """
+    n = len(df)
+    if n <= n_out:
+        return df
+
+    starts = _bucket_starts(n, n_out)
+    ends = np.append(starts[1:], n) - 1
+
+    out = {}
+    for col in df.columns:
+        values = df[col].to_numpy(dtype=np.float64)
+        if col == 'Open':
+            out[col] = values[starts]
+        elif col == 'High':
+            out[col] = np.fmax.reduceat(values, starts)
+        elif col == 'Low':
+            out[col] = np.fmin.reduceat(values, starts)
+        elif col == 'Volume':
+            out[col] = np.add.reduceat(np.nan_to_num(values), starts)
+        else:
+            out[col] = values[ends]
+
+    return pd.DataFrame(out, index=df.index[starts])
+
+
+def lttb_downsample(df, n_out, column='Close'):
+    """Réduit un historique à n_out lignes choisies par LTTB sur `column`
+
+    Le volume de chaque ligne retenue devient la somme des volumes depuis la
+    ligne retenue précédente, pour conserver le total.
+    """
+    n = len(df)
+    if n <= n_out:
+        return df
+
+    x = (df.index.asi8 - df.index.asi8[0]) / 1e9
+    y = df[column].to_numpy(dtype=np.float64)
+    y = np.where(np.isnan(y), np.nanmean(y), y)
+    indices = lttb_indices(x, y, n_out)
+
+    sampled = df.iloc[indices].copy()
+    if 'Volume' in df.columns:
+        cumulative = np.nancumsum(df['Volume'].to_numpy(dtype=np.float64))
+        totals = cumulative[indices]
+        sampled['Volume'] = np.diff(totals, prepend=0.0)
+    return sampled
+
+
+def downsample_history(df, max_points, ohlc=False):
+    """Réduit un historique au budget de points: agrégation OHLC ou LTTB sur les clôtures"""
+    if df is None or len(df) <= max_points:
+        return df
+    if ohlc:
+        return ohlc_buckets(df, max_points)
+    return lttb_downsample(df, max_points)
@@ -0,0 +1,158 @@
+"""Exports des historiques générés à la demande, par blocs de lignes (CSV, Parquet, JSON compact)"""
+import hashlib
+import io
+import json
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Nombre de lignes converties à la fois: borne la mémoire intermédiaire de chaque format
+EXPORT_CHUNK_ROWS = 50_000
+
+# Formats proposés: (extension, type MIME)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'JSON compact': ('json', 'application/json'),
+    'JSON (enregistrements)': ('json', 'application/json'),
+}
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _utc_offset(seconds):
+    sign = '-' if seconds < 0 else '+'
+    minutes = abs(int(seconds)) // 60
+    return f"{sign}{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def iso_dates(index):
+    """Dates ISO 8601 d'un DatetimeIndex, fuseau conservé, sans boucle Python par ligne"""
+    if index.tz is None:
+        return np.datetime_as_string(index.to_numpy(), unit='s')
+    local = index.tz_localize(None)
+    text = np.datetime_as_string(local.to_numpy(), unit='s')
+    offsets = (local - index.tz_convert('UTC').tz_localize(None)).total_seconds().to_numpy()
+    unique, inverse = np.unique(offsets, return_inverse=True)
+    suffixes = np.array([_utc_offset(o) for o in unique])
+    return np.char.add(text, suffixes[inverse])
+
+
+def _with_iso_dates(chunk):
+    """Bloc avec l'index daté en première colonne, au format ISO 8601"""
+    frame = chunk.reset_index()
+    frame[frame.columns[0]] = iso_dates(chunk.index)
+    return frame
+
+
+def iter_csv(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Blocs d'octets du CSV (identique à df.to_csv())"""
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        yield chunk.to_csv(header=(i == 0)).encode('utf-8')
+
+
+def iter_json(header, df, orient='split', chunk_rows=EXPORT_CHUNK_ROWS):
+    """Blocs d'octets d'un document JSON {**header, 'data': ...} sans indentation
+
+    - orient='split': 'data' vaut {'columns': [...], 'rows': [[...], ...]}, les noms
+      de colonnes n'étant écrits qu'une fois;
+    - orient='records': 'data' est une liste d'objets {colonne: valeur}.
+    """
+    prefix = json.dumps(header, default=str, separators=(',', ':'))[:-1]
+    prefix += ',' if header else ''
+    if orient == 'split':
+        columns = [df.index.name or 'index'] + [str(c) for c in df.columns]
+        yield (prefix + '"data":{"columns":' + json.dumps(columns) + ',"rows":[').encode('utf-8')
+    else:
+        yield (prefix + '"data":[').encode('utf-8')
+
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        values = _with_iso_dates(chunk).to_json(orient='values' if orient == 'split' else 'records')
+        yield ((',' if i else '') + values[1:-1]).encode('utf-8')
+
+    yield (']}}' if orient == 'split' else ']}').encode('utf-8')
+
+
+def write_parquet(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Fichier Parquet (colonnes compressées), écrit par groupes de lignes"""
+    buffer = io.BytesIO()
+    writer = None
+    for chunk in _chunks(df, chunk_rows):
+        table = pa.Table.from_pandas(chunk)
+        if writer is None:
+            writer = pq.ParquetWriter(buffer, table.schema, compression='zstd')
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+    return buffer.getvalue()
+
+
+def collect(chunks):
+    """Assemble les blocs dans un seul tampon (sans copie intermédiaire du document entier en str)"""
+    buffer = io.BytesIO()
+    for chunk in chunks:
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def export_history(df, fmt, header=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Contenu du fichier d'export au format demandé (clé de EXPORT_FORMATS)"""
+    if fmt == 'CSV':
+        return collect(iter_csv(df, chunk_rows))
+    if fmt == 'Parquet':
+        return write_parquet(df, chunk_rows)
+    orient = 'split' if fmt == 'JSON compact' else 'records'
+    return collect(iter_json(header or {}, df, orient, chunk_rows))
+
+
+def long_format(histories):
+    """Table unique au format long: une ligne par (symbole, date), colonne 'symbol' en tête"""
+    frames = []
+    for sym, df in histories.items():
+        frame = df.copy()
+        frame.insert(0, 'symbol', sym)
+        frames.append(frame)
+    return pd.concat(frames).sort_index(kind='stable')
+
+
+def _file_name(symbol):
+    return re.sub(r'[^A-Za-z0-9._-]', '_', symbol) + '.parquet'
+
+
+def write_archive(histories, layout='per_symbol', manifest=None, errors=None):
+    """Archive ZIP des historiques au format Parquet, avec un manifeste JSON
+
+    - layout='per_symbol': un fichier Parquet par symbole;
+    - layout='long': un seul fichier 'history.parquet' au format long.
+    Le manifeste décrit chaque fichier (lignes, bornes, empreinte SHA-256) et les
+    symboles en échec (`errors`: {symbole: message}).
+    """
+    manifest = dict(manifest or {}, layout=layout, files=[], errors=dict(errors or {}))
+    if layout == 'long':
+        tables = {'history.parquet': (sorted(histories), long_format(histories))} if histories else {}
+    else:
+        tables = {_file_name(sym): ([sym], histories[sym]) for sym in sorted(histories)}
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, (symbols, df) in tables.items():
+            data = write_parquet(df)
+            # Parquet est déjà compressé: inutile de le recompresser dans le ZIP
+            archive.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+            manifest['files'].append({
+                'file': name,
+                'symbols': symbols,
+                'rows': len(df),
+                'start': df.index[0].isoformat() if len(df) else None,
+                'end': df.index[-1].isoformat() if len(df) else None,
+                'sha256': hashlib.sha256(data).hexdigest()
+            })
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2, default=str))
+    return buffer.getvalue()
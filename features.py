@@ -0,0 +1,185 @@
+"""Variables explicatives (rendements décalés, volatilité, volume, relatif au DAX), mémorisées et étendues aux nouvelles barres"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from indicators import data_version
+
+FEATURE_COLUMNS = [
+    'Ret 1', 'Ret lag 1', 'Ret lag 2', 'Ret lag 3', 'Ret 5',
+    'Vol 20', 'Volume z 20', 'Rel DAX 1', 'Rel DAX 5'
+]
+
+# Indice de référence des rendements relatifs
+BENCHMARK_SYMBOL = '^GDAXI'
+
+# Barres antérieures nécessaires au calcul d'une barre (fenêtre la plus longue: 20 rendements)
+FEATURE_LOOKBACK = 20
+
+
+def _shift(x, k):
+    out = np.full(len(x), np.nan)
+    if k < len(x):
+        out[k:] = x[:len(x) - k]
+    return out
+
+
+def _rolling_std(x, window):
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = np.std(sliding_window_view(x, window), axis=1, ddof=1)
+    return out
+
+
+def _rolling_mean(x, window):
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = np.mean(sliding_window_view(x, window), axis=1)
+    return out
+
+
+def compute_features(close, volume, benchmark=None, start=0):
+    """Calcule les variables des barres [start, n) en un seul passage vectorisé
+
+    Chaque variable ne dépend que des FEATURE_LOOKBACK barres précédentes: seule
+    cette fenêtre est relue avant `start`. `benchmark` contient les clôtures de
+    l'indice alignées sur les barres (ou None: variables relatives à NaN).
+    Les rendements sont logarithmiques. Renvoie un dict colonne -> tableau de longueur n - start.
+    """
+    lo = max(start - FEATURE_LOOKBACK, 0)
+    log_close = np.log(close[lo:])
+    ret = log_close - _shift(log_close, 1)
+    ret_5 = log_close - _shift(log_close, 5)
+
+    v = volume[lo:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_z = (v - _rolling_mean(v, 20)) / _rolling_std(v, 20)
+
+    out = {
+        'Ret 1': ret,
+        'Ret lag 1': _shift(ret, 1),
+        'Ret lag 2': _shift(ret, 2),
+        'Ret lag 3': _shift(ret, 3),
+        'Ret 5': ret_5,
+        'Vol 20': _rolling_std(ret, 20),
+        'Volume z 20': volume_z
+    }
+    if benchmark is None:
+        out['Rel DAX 1'] = out['Rel DAX 5'] = np.full(len(log_close), np.nan)
+    else:
+        log_bench = np.log(benchmark[lo:])
+        out['Rel DAX 1'] = ret - (log_bench - _shift(log_bench, 1))
+        out['Rel DAX 5'] = ret_5 - (log_bench - _shift(log_bench, 5))
+    return {col: values[start - lo:] for col, values in out.items()}
+
+
+def align_benchmark(index, benchmark):
+    """Clôtures de l'indice à chaque barre (dernière clôture connue à cette date)"""
+    if benchmark is None or benchmark.empty:
+        return None
+    closes = benchmark['Close'].dropna()
+    closes.index = closes.index.tz_convert(index.tz) if index.tz is not None else closes.index
+    return closes.reindex(index, method='ffill').to_numpy(dtype=np.float64)
+
+
+def training_set(features, close, horizon, columns=FEATURE_COLUMNS):
+    """Matrice X (lignes complètes) et cible y = rendement logarithmique à `horizon` barres
+
+    Les dernières barres, dont l'avenir n'est pas encore connu, sont exclues.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    X = features[columns].to_numpy(dtype=np.float64)
+    y = np.full(len(close), np.nan)
+    y[:len(close) - horizon] = np.log(close[horizon:] / close[:len(close) - horizon])
+    valid = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    return X[valid], y[valid]
+
+
+def information_coefficients(features, close, horizon, columns=FEATURE_COLUMNS):
+    """Corrélation de chaque variable avec le rendement des `horizon` barres suivantes"""
+    X, y = training_set(features, close, horizon, columns)
+    if len(y) < 3:
+        return pd.Series(np.nan, index=columns)
+    Xc = X - X.mean(axis=0)
+    yc = y - y.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ic = (Xc.T @ yc) / (np.sqrt((Xc ** 2).sum(axis=0)) * np.sqrt((yc ** 2).sum()))
+    return pd.Series(ic, index=columns)
+
+
+class FeatureStore:
+    """Calcule et mémorise les variables explicatives par clé (symbole, période, intervalle)
+
+    Même principe que IndicatorEngine:
+    - même version des données (et de l'indice): matrice mémorisée renvoyée telle quelle;
+    - barres ajoutées à la fin: seules la dernière barre connue, les nouvelles barres et
+      celles alignées sur une clôture de l'indice qui a pu changer depuis sont calculées;
+    - sinon: recalcul complet.
+    Utilisée par la page ML (corrélations des variables avec le rendement futur), par le
+    modèle 'feature_ridge' du backtest et par le tableau des prévisions groupées; les
+    modèles de tendance polynomiale ne s'en servent pas.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.full_computations = 0
+        self.incremental_computations = 0
+
+    def compute(self, key, hist, benchmark=None):
+        """Renvoie un DataFrame des variables (FEATURE_COLUMNS) aligné sur hist.index"""
+        version = (data_version(hist), data_version(benchmark))
+        if version[0] is None:
+            return pd.DataFrame(columns=FEATURE_COLUMNS)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None and entry['version'] == version:
+            return entry['frame']
+
+        close = hist['Close'].ffill().bfill().to_numpy(dtype=np.float64)
+        volume = hist['Volume'].fillna(0).to_numpy(dtype=np.float64) if 'Volume' in hist else np.zeros(len(hist))
+        bench = align_benchmark(hist.index, benchmark)
+        bench_start = None if benchmark is None or benchmark.empty else benchmark.index[0]
+
+        start = 0
+        if entry is not None and entry['bench_start'] == bench_start:
+            known = entry['frame'].index
+            # La dernière barre connue peut être incomplète: on la recalcule, ainsi que
+            # les barres alignées sur la dernière clôture connue de l'indice
+            start = len(known) - 1
+            if entry['bench_end'] is not None:
+                start = min(start, int(hist.index.searchsorted(entry['bench_end'])))
+            if not (0 < start <= len(hist) and hist.index[:start].equals(known[:start])):
+                start = 0
+
+        if start > 0:
+            tail = compute_features(close, volume, bench, start=start)
+            frame = pd.concat([
+                entry['frame'].iloc[:start],
+                pd.DataFrame(tail, index=hist.index[start:])
+            ])
+            self.incremental_computations += 1
+        else:
+            frame = pd.DataFrame(compute_features(close, volume, bench), index=hist.index)
+            self.full_computations += 1
+
+        with self._lock:
+            self._entries[key] = {
+                'version': version,
+                'bench_start': bench_start,
+                'bench_end': None if bench_start is None else benchmark.index[-1],
+                'frame': frame
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return frame
@@ -0,0 +1,195 @@
+"""Modèles de tendance (régression polynomiale): ajustement unitaire et ajustements groupés"""
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures
+
+
+def prediction_inputs(hist):
+    """Dates, abscisses (jours depuis la première barre) et clôtures d'un historique"""
+    dates = hist.index
+    days = ((dates - dates[0]) // np.timedelta64(1, 'D')).to_numpy(dtype=np.float64)
+    return dates, days.reshape(-1, 1), hist['Close'].to_numpy(dtype=np.float64)
+
+
+def data_hash(X, y):
+    """Empreinte des données d'apprentissage"""
+    digest = hashlib.sha1(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+
+class FittedModel:
+    """Modèle ajusté, avec ses résidus et métriques calculés une seule fois"""
+
+    def __init__(self, X, y, degree, alpha=0.0):
+        self.degree = degree
+        self.alpha = alpha
+        self.last_day = float(X[-1][0])
+        # Abscisses ramenées à [0, 1]: même modèle, mais sans perte de précision sur
+        # les puissances élevées de grands nombres de jours
+        self.scale = self.last_day if self.last_day > 0 else 1.0
+        regressor = Ridge(alpha=alpha) if alpha > 0 else LinearRegression()
+        self.model = make_pipeline(PolynomialFeatures(degree=degree), regressor)
+        self.model.fit(X / self.scale, y)
+
+        # Une seule prédiction sur l'historique sert à toutes les métriques
+        residuals = y - self.model.predict(X / self.scale)
+        ss_tot = np.sum((y - y.mean()) ** 2)
+        self.residual_std = float(np.std(residuals))
+        self.rmse = float(np.sqrt(np.mean(residuals ** 2)))
+        self.mae = float(np.mean(np.abs(residuals)))
+        self.r2 = float(1 - np.sum(residuals ** 2) / ss_tot) if ss_tot > 0 else 0.0
+
+    def forecast(self, days_ahead):
+        """Prédictions pour les `days_ahead` jours suivant la dernière barre"""
+        future_days = self.last_day + np.arange(1, days_ahead + 1, dtype=np.float64)
+        return self.model.predict(future_days.reshape(-1, 1) / self.scale)
+
+
+# Au-delà de ce nombre de cellules (symboles x barres x coefficients), la matrice
+# empilée devient trop coûteuse en mémoire: ajustements répartis sur des processus
+STACK_MAX_CELLS = 20_000_000
+
+BATCH_COLUMNS = ['last_close', 'predicted', 'change_pct', 'r2', 'rmse', 'bars']
+
+
+def stacked_lstsq(days, closes, degree, alpha=0.0):
+    """Coefficients polynomiaux de plusieurs séries résolus en un seul calcul NumPy
+
+    `days` et `closes` sont des listes de tableaux (une série par élément, longueurs
+    libres). Les séries sont complétées par des lignes nulles, sans effet sur les
+    moindres carrés, puis toutes résolues par une factorisation QR empilée.
+    Les abscisses sont normalisées par série (dernier jour = 1) pour le conditionnement.
+    Avec alpha > 0, régression ridge (coefficients hors constante pénalisés), comme
+    Ridge(alpha) de sklearn sur les mêmes abscisses normalisées. Une série sans assez
+    de jours distincts reçoit la solution de norme minimale au lieu d'une erreur.
+    Renvoie (coefficients (séries x degré + 1), échelles, masque, matrice, cibles).
+    """
+    n_series = len(days)
+    lengths = np.array([len(d) for d in days])
+    n_max = lengths.max()
+
+    scale = np.array([d[-1] if d[-1] > 0 else 1.0 for d in days])
+    mask = np.arange(n_max)[None, :] < lengths[:, None]
+    x = np.zeros((n_series, n_max))
+    y = np.zeros((n_series, n_max))
+    for i, (d, c) in enumerate(zip(days, closes)):
+        x[i, :len(d)] = d / scale[i]
+        y[i, :len(c)] = c
+
+    # Matrice de Vandermonde empilée; les lignes de complément restent nulles
+    A = (x[:, :, None] ** np.arange(degree + 1)) * mask[:, :, None]
+    A_fit, y_fit = A, y
+    if alpha > 0:
+        # Ridge: lignes sqrt(alpha) * I ajoutées sous chaque système (constante exclue)
+        penalty = np.sqrt(alpha) * np.eye(degree + 1)[1:]
+        A_fit = np.concatenate([A, np.broadcast_to(penalty, (n_series, degree, degree + 1))], axis=1)
+        y_fit = np.concatenate([y, np.zeros((n_series, degree))], axis=1)
+    Q, R = np.linalg.qr(A_fit)
+    rhs = np.einsum('snk,sn->sk', Q, y_fit)
+
+    # Moins de jours distincts que de coefficients (intrajournalier sur une journée...):
+    # R est singulier, on prend la solution de norme minimale comme np.linalg.lstsq
+    diag = np.abs(np.diagonal(R, axis1=1, axis2=2))
+    singular = diag.min(axis=1) <= diag.max(axis=1) * A_fit.shape[1] * np.finfo(np.float64).eps
+    coef = np.empty((n_series, degree + 1))
+    regular = ~singular
+    if regular.any():
+        coef[regular] = np.linalg.solve(R[regular], rhs[regular][:, :, None])[:, :, 0]
+    if singular.any():
+        coef[singular] = np.einsum('skn,sn->sk', np.linalg.pinv(R[singular]), rhs[singular])
+    return coef, scale, mask, A, y
+
+
+def stacked_polyval(coef, scale, target_days):
+    """Évalue chaque polynôme (une ligne de coef) aux jours cibles (séries x points)"""
+    x = target_days / scale[:, None]
+    return np.einsum('sdk,sk->sd', x[:, :, None] ** np.arange(coef.shape[1]), coef)
+
+
+def stacked_polyfit(days, closes, degree, days_ahead):
+    """Ajuste une tendance polynomiale pour plusieurs séries et prolonge chacune de `days_ahead` jours
+
+    Renvoie un dict de tableaux: 'predicted' (séries x jours), 'r2', 'rmse', 'residual_std'.
+    """
+    coef, scale, mask, A, y = stacked_lstsq(days, closes, degree)
+    lengths = mask.sum(axis=1)
+
+    fitted = np.einsum('snk,sk->sn', A, coef)
+    residuals = np.where(mask, y - fitted, 0.0)
+    mean_y = np.sum(y, axis=1) / lengths
+    ss_res = np.sum(residuals ** 2, axis=1)
+    ss_tot = np.sum(np.where(mask, y - mean_y[:, None], 0.0) ** 2, axis=1)
+    mean_res = np.sum(residuals, axis=1) / lengths
+
+    last_days = np.array([d[-1] for d in days], dtype=np.float64)
+    future = last_days[:, None] + np.arange(1, days_ahead + 1)[None, :]
+    predicted = stacked_polyval(coef, scale, future)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, 0.0)
+    return {
+        'predicted': predicted,
+        'r2': r2,
+        'rmse': np.sqrt(ss_res / lengths),
+        'residual_std': np.sqrt(np.maximum(ss_res / lengths - mean_res ** 2, 0.0))
+    }
+
+
+def _fit_one(args):
+    """Ajustement d'une série dans un processus séparé (repli pour les très longues séries)"""
+    days, closes, degree, days_ahead = args
+    fitted = FittedModel(days.reshape(-1, 1), closes, degree)
+    return fitted.forecast(days_ahead), fitted.r2, fitted.rmse
+
+
+def batch_forecast(histories, degree, days_ahead, max_workers=None):
+    """Prévision de tendance pour tous les historiques {symbole: DataFrame}
+
+    Renvoie un DataFrame indexé par symbole (colonnes BATCH_COLUMNS), trié par
+    variation prévue décroissante. Les séries sans assez de jours distincts pour
+    déterminer le polynôme (au moins degré + 2) sont ignorées.
+    """
+    symbols, days, closes = [], [], []
+    for sym, hist in histories.items():
+        if hist is None or len(hist) < degree + 2:
+            continue
+        _, X, y = prediction_inputs(hist)
+        valid = ~np.isnan(y)
+        if len(np.unique(X[valid, 0])) < degree + 2:
+            continue
+        symbols.append(sym)
+        days.append(X[valid, 0])
+        closes.append(y[valid])
+
+    if not symbols:
+        return pd.DataFrame(columns=BATCH_COLUMNS)
+
+    cells = len(symbols) * max(len(d) for d in days) * (degree + 1)
+    if cells <= STACK_MAX_CELLS:
+        result = stacked_polyfit(days, closes, degree, days_ahead)
+        predicted, r2, rmse = result['predicted'][:, -1], result['r2'], result['rmse']
+    else:
+        # forkserver: pas de fork du serveur Streamlit multi-thread (verrous hérités dans un état incohérent)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context('forkserver')) as pool:
+            fits = list(pool.map(_fit_one, [(d, c, degree, days_ahead) for d, c in zip(days, closes)]))
+        predicted = np.array([f[0][-1] for f in fits])
+        r2 = np.array([f[1] for f in fits])
+        rmse = np.array([f[2] for f in fits])
+
+    last_close = np.array([c[-1] for c in closes])
+    table = pd.DataFrame({
+        'last_close': last_close,
+        'predicted': predicted,
+        'change_pct': (predicted / last_close - 1) * 100,
+        'r2': r2,
+        'rmse': rmse,
+        'bars': [len(d) for d in days]
+    }, index=pd.Index(symbols, name='symbol'))
+    return table.sort_values('change_pct', ascending=False)
@@ -0,0 +1,115 @@
+"""Taux de change en direct (Yahoo) avec cache TTL et rafraîchissement stale-while-revalidate"""
+import threading
+import time
+
+import numpy as np
+
+from market_data import fetch_snapshot
+
+# Paire Yahoo donnant le nombre d'unités de devise pour 1 EUR
+FX_PAIRS = {
+    'USD': 'EURUSD=X',
+    'GBP': 'EURGBP=X',
+    'CHF': 'EURCHF=X',
+}
+
+# Taux de secours si Yahoo est indisponible et qu'aucun taux n'a encore été obtenu
+FALLBACK_RATES = {
+    'USD': 1.08,
+    'GBP': 0.85,
+    'CHF': 0.95,
+}
+
+
+class FxRates:
+    """Cache des taux EUR -> devise partagé par toutes les sessions
+
+    - taux plus récent que `ttl`: servi directement;
+    - taux périmé mais plus récent que `stale_ttl`: servi immédiatement, et un
+      rafraîchissement de toutes les paires est lancé en arrière-plan;
+    - taux absent ou trop ancien: téléchargement bloquant de toutes les paires
+      (requêtes parallèles), avec repli sur FALLBACK_RATES en cas d'échec.
+    Après un échec, aucun téléchargement n'est retenté pendant `retry_after` secondes.
+    """
+
+    def __init__(self, ttl=900, stale_ttl=24 * 3600, fetch=fetch_snapshot, retry_after=60):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fetch = fetch
+        self.retry_after = retry_after
+        self._rates = {'EUR': (1.0, float('inf'))}
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._retry_at = 0.0
+
+    def _download(self, currencies):
+        pairs = {FX_PAIRS[c]: c for c in currencies if c in FX_PAIRS}
+        if not pairs:
+            return
+        try:
+            snapshot = self.fetch(list(pairs))
+        except Exception:
+            snapshot = None
+        now = time.monotonic()
+        with self._lock:
+            received = [] if snapshot is None else [
+                (pair, price) for pair, price in snapshot['price'].items() if pair in pairs and price > 0
+            ]
+            if not received:
+                # Échec mémorisé: pas de nouvelle requête (bloquante) à chaque appel
+                self._retry_at = now + self.retry_after
+            for pair, price in received:
+                self._rates[pairs[pair]] = (float(price), now)
+
+    def _refresh_in_background(self, currencies):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._download(currencies)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='fx-refresh', daemon=True).start()
+
+    def _age(self, currency, now):
+        entry = self._rates.get(currency)
+        if entry is None:
+            return float('inf')
+        if entry[1] == float('inf'):
+            return 0.0
+        return now - entry[1]
+
+    def rates_per_eur(self, currencies):
+        """Renvoie {devise: unités pour 1 EUR} pour les devises demandées"""
+        currencies = set(currencies) | {'EUR'}
+        now = time.monotonic()
+        with self._lock:
+            ages = {c: self._age(c, now) for c in currencies}
+            backoff = now < self._retry_at
+
+        missing = [c for c, age in ages.items() if age > self.stale_ttl]
+        stale = [c for c, age in ages.items() if self.ttl < age <= self.stale_ttl]
+
+        if backoff:
+            # Échec récent: taux connus ou de secours, sans nouvelle requête
+            missing = stale = []
+        if missing:
+            self._download(currencies)
+        elif stale:
+            self._refresh_in_background(currencies)
+
+        with self._lock:
+            return {
+                c: self._rates[c][0] if c in self._rates else FALLBACK_RATES.get(c, np.nan)
+                for c in currencies
+            }
+
+    def is_live(self, currency):
+        """Indique si le taux provient de Yahoo et date de moins de `stale_ttl` (sinon: secours ou ancien)"""
+        with self._lock:
+            return self._age(currency, time.monotonic()) <= self.stale_ttl
@@ -0,0 +1,197 @@
+"""Moteur d'indicateurs techniques vectorisés (NumPy) avec mémoïsation et extension incrémentale"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# Indicateurs affichables (les colonnes préfixées par '_' sont des états internes)
+INDICATOR_COLUMNS = [
+    'SMA 20', 'SMA 50', 'EMA 20', 'RSI 14', 'MACD', 'MACD signal', 'MACD hist',
+    'BB upper', 'BB middle', 'BB lower', 'ATR 14', 'VWAP'
+]
+
+
+def _ewm(x, alpha, seed=None):
+    """Moyenne exponentielle récursive (équivalent pandas ewm(adjust=False)) en un passage
+
+    `seed` est la valeur de la moyenne juste avant x[0]; sans seed, la moyenne part de x[0].
+    """
+    if len(x) == 0:
+        return x
+    if seed is None or np.isnan(seed):
+        seed = x[0]
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * seed])
+    return y
+
+
+def _rolling(x, window, start, fn):
+    """Applique fn sur les fenêtres glissantes se terminant aux positions [start, len(x))"""
+    n = len(x)
+    out = np.full(n - start, np.nan)
+    first = max(start, window - 1)
+    if first < n:
+        windows = sliding_window_view(x[first - window + 1:], window)
+        out[first - start:] = fn(windows, axis=1)
+    return out
+
+
+def _cumsum_reset(x, reset, seed):
+    """Somme cumulée remise à zéro là où reset est vrai (seed = somme avant x[0])"""
+    total = np.cumsum(x) + seed
+    base = np.where(reset, total - x, np.nan)
+    base = pd.Series(base).ffill().fillna(0.0).to_numpy()
+    return total - base
+
+
+def _prev(prev, column):
+    return None if prev is None else prev[column]
+
+
+def compute_indicators(close, high, low, volume, sessions, start=0, prev=None):
+    """Calcule tous les indicateurs pour les barres [start, n) en un seul passage
+
+    Les tableaux d'entrée couvrent tout l'historique; `prev` contient les valeurs
+    (indicateurs et états internes) de la barre start-1, ou None si start == 0.
+    Renvoie un dict colonne -> tableau de longueur n - start.
+    """
+    c = close[start:]
+    prev_close = close[start - 1] if start > 0 else c[0]
+    prev_closes = np.concatenate([[prev_close], c[:-1]])
+    out = {}
+
+    # Moyennes mobiles
+    out['SMA 20'] = _rolling(close, 20, start, np.mean)
+    out['SMA 50'] = _rolling(close, 50, start, np.mean)
+    out['EMA 20'] = _ewm(c, 2 / 21, _prev(prev, 'EMA 20'))
+
+    # RSI (lissage de Wilder: alpha = 1/14)
+    delta = c - prev_closes
+    avg_gain = _ewm(np.clip(delta, 0, None), 1 / 14, _prev(prev, '_avg_gain'))
+    avg_loss = _ewm(np.clip(-delta, 0, None), 1 / 14, _prev(prev, '_avg_loss'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['RSI 14'] = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    out['_avg_gain'], out['_avg_loss'] = avg_gain, avg_loss
+
+    # MACD (12, 26, 9)
+    ema_fast = _ewm(c, 2 / 13, _prev(prev, '_ema_fast'))
+    ema_slow = _ewm(c, 2 / 27, _prev(prev, '_ema_slow'))
+    out['MACD'] = ema_fast - ema_slow
+    out['MACD signal'] = _ewm(out['MACD'], 2 / 10, _prev(prev, 'MACD signal'))
+    out['MACD hist'] = out['MACD'] - out['MACD signal']
+    out['_ema_fast'], out['_ema_slow'] = ema_fast, ema_slow
+
+    # Bandes de Bollinger (20, 2 écarts-types)
+    middle = _rolling(close, 20, start, np.mean)
+    std = _rolling(close, 20, start, np.std)
+    out['BB middle'] = middle
+    out['BB upper'] = middle + 2 * std
+    out['BB lower'] = middle - 2 * std
+
+    # ATR (Wilder, 14)
+    h, l = high[start:], low[start:]
+    true_range = np.maximum(h - l, np.maximum(np.abs(h - prev_closes), np.abs(l - prev_closes)))
+    out['ATR 14'] = _ewm(true_range, 1 / 14, _prev(prev, 'ATR 14'))
+
+    # VWAP cumulé, remis à zéro à chaque nouvelle séance
+    typical = (h + l + c) / 3
+    v = volume[start:]
+    s = sessions[start:]
+    prev_session = sessions[start - 1] if start > 0 else None
+    reset = np.concatenate([[prev_session is None or s[0] != prev_session], s[1:] != s[:-1]])
+    seed_pv = 0.0 if reset[0] else _prev(prev, '_cum_pv')
+    seed_v = 0.0 if reset[0] else _prev(prev, '_cum_v')
+    cum_pv = _cumsum_reset(typical * v, reset, seed_pv)
+    cum_v = _cumsum_reset(v, reset, seed_v)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['VWAP'] = np.where(cum_v > 0, cum_pv / cum_v, np.nan)
+    out['_cum_pv'], out['_cum_v'] = cum_pv, cum_v
+
+    return out
+
+
+def _inputs(hist, intraday):
+    """Tableaux NumPy d'entrée (valeurs manquantes propagées vers l'avant)"""
+    frame = hist[['High', 'Low', 'Close', 'Volume']].ffill().bfill()
+    if intraday:
+        sessions = hist.index.normalize().asi8
+    else:
+        sessions = np.zeros(len(hist), dtype=np.int64)
+    return (
+        frame['Close'].to_numpy(dtype=np.float64),
+        frame['High'].to_numpy(dtype=np.float64),
+        frame['Low'].to_numpy(dtype=np.float64),
+        frame['Volume'].to_numpy(dtype=np.float64),
+        sessions
+    )
+
+
+def data_version(hist):
+    """Identifiant de version d'un historique (taille, bornes et dernière barre)"""
+    if hist is None or hist.empty:
+        return None
+    last = hist.iloc[-1]
+    return (len(hist), hist.index[0].value, hist.index[-1].value,
+            float(last['Close']), float(last.get('Volume', 0)))
+
+
+class IndicatorEngine:
+    """Calcule et mémorise les indicateurs par (symbole, intervalle)
+
+    - même version de données: résultat mémorisé renvoyé tel quel;
+    - nouvelles barres ajoutées à la fin: seules la dernière barre connue (qui a pu
+      changer) et les nouvelles barres sont calculées, à partir de l'état précédent;
+    - sinon: recalcul complet.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.full_computations = 0
+        self.incremental_computations = 0
+
+    def compute(self, key, hist, intraday=False):
+        """Renvoie un DataFrame des indicateurs (INDICATOR_COLUMNS) aligné sur hist.index"""
+        version = data_version(hist)
+        if version is None:
+            return pd.DataFrame(columns=INDICATOR_COLUMNS)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None and entry['version'] == version:
+            return entry['frame'][INDICATOR_COLUMNS]
+
+        arrays = _inputs(hist, intraday)
+        start = 0
+        if entry is not None and entry['intraday'] == intraday:
+            known = entry['frame'].index
+            # La dernière barre connue peut être incomplète: on la recalcule
+            start = len(known) - 1
+            if not (0 < start <= len(hist) and hist.index[:start].equals(known[:start])):
+                start = 0
+
+        if start > 0:
+            prev = entry['frame'].iloc[start - 1]
+            tail = compute_indicators(*arrays, start=start, prev=prev)
+            frame = pd.concat([
+                entry['frame'].iloc[:start],
+                pd.DataFrame(tail, index=hist.index[start:])
+            ])
+            self.incremental_computations += 1
+        else:
+            frame = pd.DataFrame(compute_indicators(*arrays), index=hist.index)
+            self.full_computations += 1
+
+        with self._lock:
+            self._entries[key] = {'version': version, 'intraday': intraday, 'frame': frame}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return frame[INDICATOR_COLUMNS]
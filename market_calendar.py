@@ -0,0 +1,166 @@
+"""Calendrier de négociation Xetra (jours fériés calculés, demi-séances) et planification des requêtes"""
+from datetime import date, datetime, time, timedelta
+
+import pytz
+
+GERMANY_TIMEZONE = pytz.timezone('Europe/Berlin')
+
+# Séance continue Xetra (heure de Francfort, CET/CEST)
+XETRA_OPEN = time(9, 0)
+XETRA_CLOSE = time(17, 30)
+
+# Clôture anticipée du dernier jour de bourse de l'année
+XETRA_HALF_DAY_CLOSE = time(14, 0)
+
+# Symboles négociés aux horaires Xetra. Les autres (places régionales ouvertes plus
+# tard, marchés US...) sont considérés comme ouverts: rythme de base en permanence
+XETRA_SUFFIXES = ('.DE',)
+XETRA_INDICES = {'^GDAXI', '^MDAXI', '^SDAXI', '^TECDAX', '^HDAXI'}
+
+
+def easter_sunday(year):
+    """Date du dimanche de Pâques (algorithme grégorien anonyme / Meeus)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def xetra_holidays(year):
+    """Jours de fermeture Xetra pour une année: {date: nom}
+
+    Ascension, lundi de Pentecôte et le 3 octobre sont des jours fériés légaux
+    mais des jours de bourse normaux sur Xetra.
+    """
+    easter = easter_sunday(year)
+    return {
+        date(year, 1, 1): "Jour de l'an",
+        easter - timedelta(days=2): "Vendredi saint",
+        easter + timedelta(days=1): "Lundi de Pâques",
+        date(year, 5, 1): "Fête du travail",
+        date(year, 12, 24): "Veille de Noël",
+        date(year, 12, 25): "Noël",
+        date(year, 12, 26): "Lendemain de Noël",
+        date(year, 12, 31): "Saint-Sylvestre",
+    }
+
+
+def follows_xetra(symbols):
+    """Indique si tous les symboles suivent les horaires de séance Xetra"""
+    return all(s.endswith(XETRA_SUFFIXES) or s in XETRA_INDICES for s in symbols)
+
+
+def is_trading_day(day):
+    """Indique si Xetra négocie ce jour-là (hors week-end et jours fériés)"""
+    return day.weekday() < 5 and day not in xetra_holidays(day.year)
+
+
+def xetra_half_days(year):
+    """Demi-séances: {date: heure de clôture} (dernier jour de bourse avant le 31 décembre)"""
+    day = date(year, 12, 30)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return {day: XETRA_HALF_DAY_CLOSE}
+
+
+def session_bounds(day):
+    """Ouverture et clôture (datetimes de Francfort) de la séance du jour, ou None si fermé"""
+    if not is_trading_day(day):
+        return None
+    close = xetra_half_days(day.year).get(day, XETRA_CLOSE)
+    return (
+        GERMANY_TIMEZONE.localize(datetime.combine(day, XETRA_OPEN)),
+        GERMANY_TIMEZONE.localize(datetime.combine(day, close))
+    )
+
+
+def _to_germany(now):
+    if now is None:
+        return datetime.now(GERMANY_TIMEZONE)
+    if now.tzinfo is None:
+        return GERMANY_TIMEZONE.localize(now)
+    return now.astimezone(GERMANY_TIMEZONE)
+
+
+def is_market_open(now=None):
+    """Indique si la séance continue Xetra est en cours"""
+    now = _to_germany(now)
+    bounds = session_bounds(now.date())
+    return bounds is not None and bounds[0] <= now <= bounds[1]
+
+
+def next_open(now=None):
+    """Prochaine ouverture de Xetra strictement après `now`"""
+    now = _to_germany(now)
+    day = now.date()
+    while True:
+        bounds = session_bounds(day)
+        if bounds is not None and bounds[0] > now:
+            return bounds[0]
+        day += timedelta(days=1)
+
+
+def previous_close(now=None):
+    """Dernière clôture de Xetra au plus tard à `now`"""
+    now = _to_germany(now)
+    day = now.date()
+    while True:
+        bounds = session_bounds(day)
+        if bounds is not None and bounds[1] <= now:
+            return bounds[1]
+        day -= timedelta(days=1)
+
+
+def xetra_market_status(now=None):
+    """Statut lisible du marché: (libellé, icône)"""
+    now = _to_germany(now)
+    day = now.date()
+
+    if day.weekday() >= 5:
+        return "Fermé (weekend)", "🔴"
+
+    holiday = xetra_holidays(day.year).get(day)
+    if holiday:
+        return f"Fermé (jour férié: {holiday})", "🔴"
+
+    if is_market_open(now):
+        close = session_bounds(day)[1]
+        if close.time() != XETRA_CLOSE:
+            return f"Ouvert (demi-séance, clôture {close.strftime('%H:%M')})", "🟢"
+        return "Ouvert", "🟢"
+
+    return "Fermé", "🔴"
+
+
+def poll_interval(base_seconds, now=None, symbols=()):
+    """Intervalle de rafraîchissement adapté au calendrier
+
+    Pendant la séance: `base_seconds`. Marché fermé: on attend la prochaine
+    ouverture (les cours ne peuvent pas changer), soit au moins `base_seconds`.
+    Si l'un des `symbols` ne suit pas les horaires Xetra: toujours `base_seconds`.
+    """
+    now = _to_germany(now)
+    if is_market_open(now) or not follows_xetra(symbols):
+        return base_seconds
+    return max(base_seconds, int((next_open(now) - now).total_seconds()))
+
+
+def cache_max_age(base_seconds, now=None, settle_seconds=900, symbols=()):
+    """Âge maximal acceptable d'une cotation en cache
+
+    Pendant la séance: `base_seconds`. Marché fermé: toute donnée obtenue après la
+    dernière clôture (plus un délai pour les cours de clôture) reste valable.
+    Si l'un des `symbols` ne suit pas les horaires Xetra: toujours `base_seconds`.
+    """
+    now = _to_germany(now)
+    if is_market_open(now) or not follows_xetra(symbols):
+        return base_seconds
+    settled = (now - previous_close(now)).total_seconds() - settle_seconds
+    return max(base_seconds, int(settled))
@@ -0,0 +1,220 @@
+"""Accès aux données de marché (yfinance) partagé par le tableau de bord"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from rate_limiter import is_rate_limit_error, yahoo_limiter
+
+# Colonnes du tableau de cotations renvoyé par fetch_snapshot
+SNAPSHOT_COLUMNS = ['price', 'previous_close', 'change', 'change_pct']
+
+# Paramètres par défaut du moteur de requêtes concurrentes
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 10
+
+# Durée de vie par défaut des entrées du cache partagé (s)
+DEFAULT_SHARED_TTL = 60
+
+
+def build_snapshot(closes):
+    """Construit le tableau prix / clôture précédente / variation à partir des clôtures
+
+    closes peut être un DataFrame (une colonne par symbole) ou un dict symbole -> Series.
+    """
+    rows = {}
+    for sym, series in closes.items():
+        series = series.dropna()
+        if series.empty:
+            continue
+        price = float(series.iloc[-1])
+        prev_close = float(series.iloc[-2]) if len(series) > 1 else price
+        change = price - prev_close
+        change_pct = (change / prev_close * 100) if prev_close != 0 else 0.0
+        rows[sym] = [price, prev_close, change, change_pct]
+
+    snapshot = pd.DataFrame.from_dict(rows, orient='index', columns=SNAPSHOT_COLUMNS)
+    snapshot.index.name = 'symbol'
+    return snapshot
+
+
+def fetch_panel(symbols, period='5d', history=None, max_workers=DEFAULT_MAX_WORKERS,
+                timeout=DEFAULT_TIMEOUT, limiter=yahoo_limiter):
+    """Clôtures journalières de plusieurs symboles, une requête par symbole en parallèle
+
+    Yahoo ne sert qu'un symbole par requête d'historique (yf.download ne fait
+    qu'enchaîner ces requêtes): elles partent en parallèle sur un pool de threads
+    borné, chacune après avoir obtenu un jeton du limiteur en au plus `timeout`
+    secondes. `history(symbole)` remplace la requête Yahoo (benchmarks).
+
+    Renvoie (clôtures {symbole: Series sans valeur manquante}, erreurs {symbole: erreur}).
+    Si une requête est limitée par Yahoo (429) ou n'obtient pas de jeton, l'exception
+    est levée et les requêtes restantes sont abandonnées.
+    """
+    if history is None:
+        history = lambda sym: yf.Ticker(sym).history(period=period, interval='1d', timeout=timeout)
+
+    closes, errors = {}, {}
+    # Délai par symbole: attente du jeton puis requête
+    for sym, hist, error in iter_fetch(
+        symbols, lambda sym: limiter.call(history, sym, timeout=timeout), max_workers, 2 * timeout
+    ):
+        if error is not None:
+            if is_rate_limit_error(error):
+                raise error
+            errors[sym] = error
+            continue
+        series = None if hist is None or 'Close' not in hist else hist['Close'].dropna()
+        if series is None or series.empty:
+            errors[sym] = "Aucune donnée"
+        else:
+            closes[sym] = series.astype(np.float64)
+    return closes, errors
+
+
+def fetch_snapshot(symbols, period='5d', history=None, max_workers=DEFAULT_MAX_WORKERS,
+                   timeout=DEFAULT_TIMEOUT, limiter=yahoo_limiter):
+    """Cotations de plusieurs symboles (requêtes parallèles, voir fetch_panel)
+
+    Renvoie un DataFrame indexé par symbole (colonnes SNAPSHOT_COLUMNS).
+    Les symboles sans donnée sont absents du résultat. Mêmes exceptions que fetch_panel.
+    """
+    closes, _ = fetch_panel(symbols, period, history, max_workers, timeout, limiter)
+    return build_snapshot(closes)
+
+
+def fetch_history(symbol, period='1d', interval='1d', timeout=DEFAULT_TIMEOUT):
+    """Télécharge l'historique d'un symbole (une requête, soumise au limiteur global)"""
+    return yahoo_limiter.call(
+        lambda: yf.Ticker(symbol).history(period=period, interval=interval, timeout=timeout),
+        timeout=timeout
+    )
+
+
+def iter_fetch(symbols, fetch_fn, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """Exécute fetch_fn(symbol) sur un pool de threads borné
+
+    Génère des tuples (symbole, résultat, erreur) au fur et à mesure que les requêtes
+    se terminent. Une requête qui dépasse `timeout` secondes après son démarrage est
+    abandonnée et signalée par une TimeoutError, sans bloquer les autres symboles.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return
+
+    started = {}
+
+    def run(sym):
+        started[sym] = time.monotonic()
+        return fetch_fn(sym)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols))))
+    try:
+        pending = {executor.submit(run, sym): sym for sym in symbols}
+        while pending:
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                sym = pending.pop(future)
+                error = future.exception()
+                yield sym, (None if error else future.result()), error
+
+            now = time.monotonic()
+            for future, sym in list(pending.items()):
+                if sym in started and now - started[sym] > timeout:
+                    pending.pop(future)
+                    yield sym, None, TimeoutError(f"{sym}: délai de {timeout}s dépassé")
+    finally:
+        # Les threads abandonnés se terminent en arrière-plan
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_many(symbols, fetch_fn, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """Version bloquante de iter_fetch: renvoie (résultats, erreurs) indexés par symbole"""
+    results, errors = {}, {}
+    for sym, result, error in iter_fetch(symbols, fetch_fn, max_workers, timeout):
+        if error is None:
+            results[sym] = result
+        else:
+            errors[sym] = error
+    return results, errors
+
+
+class SingleFlightCache:
+    """Cache partagé par toutes les sessions, avec fusion des requêtes simultanées
+
+    Les appels concurrents à get() pour une même clé (par exemple
+    ('history', symbole, période, intervalle)) ne déclenchent qu'un seul
+    téléchargement: le premier appelant l'exécute, les suivants attendent son
+    résultat. Les valeurs renvoyées sont partagées et ne doivent pas être modifiées.
+    Au-delà de `max_entries` entrées, les moins récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, ttl=DEFAULT_SHARED_TTL, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key, fetch_fn, ttl=None):
+        """Renvoie la valeur en cache pour `key`, ou la calcule une seule fois via fetch_fn()"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = Future()
+                self._inflight[key] = flight
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                value = fetch_fn()
+            except BaseException as e:
+                flight.set_exception(e)
+            else:
+                with self._lock:
+                    self._entries[key] = (time.monotonic(), value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                flight.set_result(value)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+        return flight.result()
+
+    def invalidate(self, key=None):
+        """Supprime une entrée (ou tout le cache si key est None)"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Compteurs de succès, d'échecs et de requêtes fusionnées"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries),
+                'inflight': len(self._inflight)
+            }
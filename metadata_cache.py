@@ -0,0 +1,99 @@
+"""Cache longue durée des métadonnées d'entreprise (ticker.info), persisté sur disque"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yfinance as yf
+
+from bar_store import DEFAULT_CACHE_DIR
+from rate_limiter import yahoo_limiter
+
+# Les métadonnées (nom, secteur, capitalisation, PER, beta) changent au plus une fois par jour
+DEFAULT_INFO_TTL = 24 * 3600
+
+# Attente maximale d'un jeton du limiteur Yahoo (s): un rafraîchissement n'occupe pas un thread indéfiniment
+INFO_LIMITER_WAIT = 30
+
+
+def fetch_info(symbol):
+    """Télécharge ticker.info (requête lente et fortement limitée par Yahoo)"""
+    return yahoo_limiter.call(getattr, yf.Ticker(symbol), 'info', timeout=INFO_LIMITER_WAIT)
+
+
+class MetadataCache:
+    """Cache mémoire + disque de ticker.info avec rafraîchissement en arrière-plan
+
+    get() ne bloque jamais sur le réseau: il renvoie la dernière valeur connue (même
+    périmée) et planifie un rafraîchissement si elle manque ou a dépassé le TTL.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, ttl=DEFAULT_INFO_TTL, fetch=fetch_info, max_workers=2):
+        self.root = os.path.join(root, 'info')
+        self.ttl = ttl
+        self.fetch = fetch
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='info-refresh')
+
+    def _path(self, symbol):
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9._-]', '_', symbol) + '.json')
+
+    def _read_disk(self, symbol):
+        try:
+            with open(self._path(symbol)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, symbol, entry):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(symbol)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(entry, f, default=str)
+        os.replace(path + '.tmp', path)
+
+    def _refresh(self, symbol):
+        try:
+            info = self.fetch(symbol)
+            if info:
+                entry = {'fetched_at': time.time(), 'info': info}
+                self._write_disk(symbol, entry)
+                with self._lock:
+                    self._entries[symbol] = entry
+        except Exception:
+            # On garde la dernière valeur connue; nouvel essai au prochain get()
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(symbol)
+
+    def _schedule_refresh(self, symbol):
+        with self._lock:
+            if symbol in self._refreshing:
+                return
+            self._refreshing.add(symbol)
+        self._executor.submit(self._refresh, symbol)
+
+    def get(self, symbol):
+        """Renvoie le dict info connu pour le symbole (ou None) sans attendre le réseau"""
+        with self._lock:
+            entry = self._entries.get(symbol)
+        if entry is None:
+            entry = self._read_disk(symbol)
+            if entry is not None:
+                with self._lock:
+                    self._entries[symbol] = entry
+
+        if entry is None or time.time() - entry.get('fetched_at', 0) > self.ttl:
+            self._schedule_refresh(symbol)
+
+        return entry['info'] if entry else None
+
+    def is_refreshing(self, symbol):
+        """Indique si un rafraîchissement est en cours pour le symbole"""
+        with self._lock:
+            return symbol in self._refreshing
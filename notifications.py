@@ -0,0 +1,196 @@
+"""Envoi des notifications email en arrière-plan: file d'attente, connexion SMTP réutilisée, relances et digest"""
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# Nombre de tentatives par message et délai initial entre deux tentatives (doublé à chaque échec)
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 2.0
+
+# Connexion fermée après ce délai d'inactivité (les serveurs la coupent de toute façon)
+DEFAULT_IDLE_TIMEOUT = 60
+
+# Délai de connexion / d'échange avec le serveur SMTP
+SMTP_TIMEOUT = 30
+
+# Serveurs sur lesquels l'authentification sans TLS est tolérée (le mot de passe ne quitte pas la machine)
+LOCAL_SMTP_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+
+def build_message(sender, to_email, subject, body):
+    """Message HTML prêt à l'envoi"""
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+
+def build_digest(items):
+    """Regroupe plusieurs notifications (sujet, corps) en un seul email"""
+    subject = f"🚨 {len(items)} alertes prix"
+    body = "<hr>".join(body for _, body in items)
+    return subject, body
+
+
+class SmtpConnection:
+    """Connexion SMTP authentifiée ouverte à la demande et réutilisée entre les messages
+
+    STARTTLS est négocié si le serveur l'annonce et la connexion n'est authentifiée
+    que si un mot de passe est fourni: un serveur SMTP local de test (par exemple
+    `python -m aiosmtpd -n -l localhost:1025`) fonctionne tel quel. Le mot de passe
+    n'est jamais envoyé en clair à un serveur distant (réponse EHLO sans STARTTLS,
+    éventuellement altérée en chemin), sauf avec `allow_insecure=True`.
+    """
+
+    def __init__(self, server, port, email, password, connect=smtplib.SMTP, allow_insecure=False):
+        self.server = server
+        self.port = port
+        self.email = email
+        self.password = password
+        self.connect = connect
+        self.allow_insecure = allow_insecure
+        self.connections = 0
+        self._smtp = None
+
+    def _open(self):
+        smtp = self.connect(self.server, self.port, timeout=SMTP_TIMEOUT)
+        smtp.ehlo()
+        if smtp.has_extn('starttls'):
+            smtp.starttls()
+            smtp.ehlo()
+        if self.password:
+            encrypted = isinstance(getattr(smtp, 'sock', None), ssl.SSLSocket)
+            if not (encrypted or self.allow_insecure or self.server in LOCAL_SMTP_HOSTS):
+                smtp.close()
+                raise smtplib.SMTPNotSupportedError(
+                    f"{self.server} ne propose pas STARTTLS: authentification refusée sans chiffrement"
+                )
+            smtp.login(self.email, self.password)
+        self._smtp = smtp
+        self.connections += 1
+
+    def send(self, msg):
+        """Envoie un message, en rouvrant la connexion si le serveur l'a fermée"""
+        if self._smtp is None:
+            self._open()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._smtp = None
+            self._open()
+            self._smtp.send_message(msg)
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+
+class EmailDispatcher:
+    """File d'envoi d'emails traitée par un thread dédié
+
+    - `submit` ne bloque pas: il renvoie un Future résolu à True (envoyé) ou
+      False (échec après toutes les tentatives);
+    - une seule connexion SMTP est ouverte et réutilisée pour tous les messages,
+      puis fermée après `idle_timeout` secondes d'inactivité;
+    - en cas d'échec, nouvelle tentative après `backoff`, 2 * `backoff`... secondes;
+    - avec `digest_window` > 0, les notifications soumises dans cette fenêtre pour
+      un même destinataire sont regroupées en un seul email.
+    """
+
+    def __init__(self, server, port, email, password, digest_window=0,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, connect=smtplib.SMTP, allow_insecure=False):
+        self.email = email
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._connection = SmtpConnection(server, port, email, password, connect, allow_insecure)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stats = {'sent': 0, 'failed': 0, 'retries': 0, 'digests': 0}
+        self.errors = deque(maxlen=20)
+
+    def submit(self, subject, body, to_email):
+        """Met une notification en file d'attente et renvoie un Future"""
+        future = Future()
+        self._queue.put((to_email, subject, body, future))
+        self._ensure_worker()
+        return future
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='email-dispatcher', daemon=True)
+                self._worker.start()
+
+    def _collect(self, first):
+        """Notifications arrivées pendant la fenêtre de digest, groupées par destinataire"""
+        batches = {first[0]: [first]}
+        deadline = time.monotonic() + self.digest_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batches.setdefault(item[0], []).append(item)
+        return batches.values()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._connection.close()
+                continue
+
+            batches = self._collect(first) if self.digest_window > 0 else [[first]]
+            for batch in batches:
+                to_email = batch[0][0]
+                if len(batch) == 1:
+                    subject, body = batch[0][1], batch[0][2]
+                else:
+                    subject, body = build_digest([(item[1], item[2]) for item in batch])
+                    self._stats['digests'] += 1
+
+                ok = self._deliver(build_message(self.email, to_email, subject, body))
+                for item in batch:
+                    item[3].set_result(ok)
+
+    def _deliver(self, msg):
+        delay = self.backoff
+        for attempt in range(self.max_retries):
+            try:
+                self._connection.send(msg)
+                self._stats['sent'] += 1
+                return True
+            except Exception as e:
+                self.errors.append(f"{time.strftime('%H:%M:%S')} {msg['Subject']}: {e}")
+                self._connection.close()
+                if attempt < self.max_retries - 1:
+                    self._stats['retries'] += 1
+                    time.sleep(delay)
+                    delay *= 2
+        self._stats['failed'] += 1
+        return False
+
+    def stats(self):
+        """Compteurs d'envoi et taille de la file d'attente"""
+        return dict(self._stats, connections=self._connection.connections, queued=self._queue.qsize())
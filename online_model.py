@@ -0,0 +1,244 @@
+"""Modèle de tendance mis à jour en ligne (statistiques suffisantes des moindres carrés), persisté par symbole"""
+import copy
+import os
+import re
+import threading
+
+import numpy as np
+
+from bar_store import DEFAULT_CACHE_DIR
+
+DAY_NS = 86_400 * 10**9
+
+# Recalcul complet au-delà de ce nombre de mises à jour (dérive numérique des
+# soustractions successives) ou quand les abscisses dépassent cette borne
+# (l'échelle fixée au premier ajustement ne conditionne plus bien le système)
+REBUILD_EVERY = 500
+MAX_SCALED_DAY = 4.0
+
+
+class OnlineTrendModel:
+    """Régression polynomiale (ou ridge) tenue à jour barre par barre
+
+    Le modèle conserve G = AᵀA, b = Aᵀy, Σy et Σy² sur les barres retenues:
+    ajouter, retirer ou corriger une barre coûte O(degré²) et la solution se lit
+    dans un système (degré + 1) x (degré + 1). Les abscisses sont les jours écoulés
+    depuis la première barre du premier ajustement, divisés par une échelle fixe.
+    Même interface que forecasting.FittedModel (forecast, rmse, mae, r2, residual_std).
+    """
+
+    def __init__(self, degree, alpha=0.0):
+        self.degree = degree
+        self.alpha = alpha
+        self.epoch = None
+        self.scale = 1.0
+        self.ts = np.empty(0, dtype=np.int64)
+        self.closes = np.empty(0, dtype=np.float64)
+        self.G = np.zeros((degree + 1, degree + 1))
+        self.b = np.zeros(degree + 1)
+        self.sy = 0.0
+        self.syy = 0.0
+        self.updates = 0
+        self._coef = None
+
+    def _days(self, ts):
+        return ((ts - self.epoch) // DAY_NS).astype(np.float64)
+
+    def _accumulate(self, ts, closes, sign):
+        if len(ts) == 0:
+            return
+        A = (self._days(ts) / self.scale)[:, None] ** np.arange(self.degree + 1)
+        self.G += sign * (A.T @ A)
+        self.b += sign * (A.T @ closes)
+        self.sy += sign * float(closes.sum())
+        self.syy += sign * float(closes @ closes)
+        self._coef = None
+
+    def rebuild(self, ts, closes):
+        """Recalcule les statistiques sur tout l'historique"""
+        self.epoch = int(ts[0])
+        last_day = float((ts[-1] - ts[0]) // DAY_NS)
+        self.scale = last_day if last_day > 0 else 1.0
+        self.G[:] = 0.0
+        self.b[:] = 0.0
+        self.sy = self.syy = 0.0
+        self.updates = 0
+        self._accumulate(ts, closes, 1)
+        self.ts, self.closes = ts.copy(), closes.copy()
+        return 'rebuilt'
+
+    def update(self, ts, closes):
+        """Aligne le modèle sur un historique (horodatages ns, clôtures)
+
+        Seules les barres sorties de la période, la dernière barre connue (qui a pu
+        changer) et les nouvelles barres sont traitées. Si l'historique ne prolonge
+        pas celui du modèle (trou, barres ajustées...), tout est recalculé.
+        Renvoie 'unchanged', 'incremental' ou 'rebuilt'.
+        """
+        if self.epoch is None or len(self.ts) == 0 or len(ts) == 0:
+            return self.rebuild(ts, closes)
+
+        dropped = int(np.searchsorted(self.ts, ts[0]))
+        kept = len(self.ts) - dropped
+        consistent = (
+            kept > 0
+            and len(ts) >= kept
+            and ts[0] == self.ts[dropped]
+            and ts[kept - 1] == self.ts[-1]
+            and closes[0] == self.closes[dropped]
+        )
+        if not consistent or self.updates >= REBUILD_EVERY:
+            return self.rebuild(ts, closes)
+        if self._days(ts[-1:])[0] / self.scale > MAX_SCALED_DAY:
+            return self.rebuild(ts, closes)
+
+        last_changed = closes[kept - 1] != self.closes[-1]
+        if dropped == 0 and not last_changed and len(ts) == kept:
+            return 'unchanged'
+
+        self._accumulate(self.ts[:dropped], self.closes[:dropped], -1)
+        if last_changed:
+            self._accumulate(self.ts[-1:], self.closes[-1:], -1)
+            self._accumulate(ts[kept - 1:kept], closes[kept - 1:kept], 1)
+        self._accumulate(ts[kept:], closes[kept:], 1)
+
+        self.ts, self.closes = ts.copy(), closes.copy()
+        self.updates += 1
+        return 'incremental'
+
+    @property
+    def coef(self):
+        if self._coef is None:
+            penalty = self.alpha * np.diag(np.r_[0.0, np.ones(self.degree)])
+            # Moins de jours distincts que de coefficients (période 1d en intrajournalier):
+            # système singulier, solution de norme minimale comme LinearRegression
+            self._coef = np.linalg.lstsq(self.G + penalty, self.b, rcond=None)[0]
+        return self._coef
+
+    @property
+    def n(self):
+        return len(self.ts)
+
+    @property
+    def last_day(self):
+        return float(self._days(self.ts[-1:])[0])
+
+    @property
+    def rmse(self):
+        return float(np.sqrt(self._ss_res() / self.n))
+
+    @property
+    def r2(self):
+        ss_tot = self.syy - self.sy ** 2 / self.n
+        return float(1 - self._ss_res() / ss_tot) if ss_tot > 0 else 0.0
+
+    @property
+    def residual_std(self):
+        # La première colonne de A vaut 1: G[0] = ΣA, d'où la moyenne des résidus
+        mean_res = (self.sy - self.G[0] @ self.coef) / self.n
+        return float(np.sqrt(max(self._ss_res() / self.n - mean_res ** 2, 0.0)))
+
+    @property
+    def mae(self):
+        # Seule métrique non déductible des statistiques: un passage vectorisé sur les barres
+        A = (self._days(self.ts) / self.scale)[:, None] ** np.arange(self.degree + 1)
+        return float(np.mean(np.abs(self.closes - A @ self.coef)))
+
+    def _ss_res(self):
+        c = self.coef
+        return max(self.syy - 2 * c @ self.b + c @ self.G @ c, 0.0)
+
+    def forecast(self, days_ahead):
+        """Prédictions pour les `days_ahead` jours suivant la dernière barre"""
+        x = (self.last_day + np.arange(1, days_ahead + 1)) / self.scale
+        return (x[:, None] ** np.arange(self.degree + 1)) @ self.coef
+
+    def snapshot(self):
+        """Copie figée: les mises à jour ultérieures du modèle ne la modifient pas"""
+        model = copy.copy(self)
+        model.G, model.b = self.G.copy(), self.b.copy()
+        return model
+
+    def to_arrays(self):
+        return {
+            'params': np.array([self.degree, self.alpha, self.scale, self.sy, self.syy, self.updates]),
+            'epoch': np.array([self.epoch], dtype=np.int64),
+            'ts': self.ts, 'closes': self.closes, 'G': self.G, 'b': self.b
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        degree, alpha, scale, sy, syy, updates = arrays['params']
+        model = cls(int(degree), float(alpha))
+        model.scale, model.sy, model.syy, model.updates = float(scale), float(sy), float(syy), int(updates)
+        model.epoch = int(arrays['epoch'][0])
+        model.ts, model.closes = arrays['ts'], arrays['closes']
+        model.G, model.b = arrays['G'], arrays['b']
+        return model
+
+
+class OnlineModelStore:
+    """Modèles en ligne par (symbole, période, intervalle, degré, alpha), en mémoire et sur disque
+
+    Un modèle survit aux reruns (mémoire) et aux redémarrages (fichier .npz): après
+    un redémarrage, seules les barres arrivées entre-temps sont intégrées. get()
+    renvoie une copie prise sous verrou, que les autres sessions ne modifient pas.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = os.path.join(root, 'models')
+        self._models = {}
+        self._lock = threading.Lock()
+        self.counts = {'unchanged': 0, 'incremental': 0, 'rebuilt': 0}
+
+    def _path(self, key):
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', '__'.join(str(part) for part in key))
+        return os.path.join(self.root, name + '.npz')
+
+    def _load(self, key, degree, alpha):
+        try:
+            with np.load(self._path(key)) as data:
+                return OnlineTrendModel.from_arrays(dict(data))
+        except Exception:
+            return OnlineTrendModel(degree, alpha)
+
+    def _save(self, key, model):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **model.to_arrays())
+        os.replace(path + '.tmp', path)
+
+    def get(self, symbol, period, interval, degree, alpha, hist, persist=True):
+        """Modèle aligné sur `hist` (mis à jour de manière incrémentale si possible)
+
+        persist=False (données de démonstration): modèle ajusté à part, ni mémorisé
+        ni écrit sur disque.
+        """
+        key = (symbol, period, interval, degree, alpha)
+        hist = hist[hist['Close'].notna()]
+        # Heure locale sans fuseau: un changement d'heure ne décale pas le décompte des jours
+        index = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+        ts = index.as_unit('ns').asi8
+        closes = hist['Close'].to_numpy(dtype=np.float64)
+
+        if not persist:
+            model = OnlineTrendModel(degree, alpha)
+            model.rebuild(ts, closes)
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(key, degree, alpha)
+                self._models[key] = model
+            mode = model.update(ts, closes)
+            self.counts[mode] += 1
+            if mode != 'unchanged':
+                try:
+                    self._save(key, model)
+                except OSError:
+                    pass
+            # Système résolu une seule fois, avant la copie
+            model.coef
+            return model.snapshot()
@@ -0,0 +1,95 @@
+"""Portefeuille virtuel en colonnes (DataFrame typé) et valorisation vectorisée"""
+import numpy as np
+import pandas as pd
+
+# Colonnes d'une position (une ligne par achat) et leurs types
+POSITION_DTYPES = {
+    'symbol': 'string',
+    'shares': 'float64',
+    'buy_price': 'float64',
+    'currency': 'string',
+    'date': 'string'
+}
+
+
+def empty_positions():
+    """Table de positions vide, correctement typée"""
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in POSITION_DTYPES.items()})
+
+
+def add_position(positions, symbol, shares, buy_price, currency, date):
+    """Renvoie une nouvelle table avec la position ajoutée"""
+    row = pd.DataFrame([{
+        'symbol': symbol,
+        'shares': shares,
+        'buy_price': buy_price,
+        'currency': currency,
+        'date': date
+    }]).astype(POSITION_DTYPES)
+    if positions.empty:
+        return row
+    return pd.concat([positions, row], ignore_index=True)
+
+
+def positions_from_records(portfolio, currency_of):
+    """Convertit l'ancien format {symbole: [{'shares', 'buy_price', 'date'}, ...]}"""
+    rows = [
+        {
+            'symbol': sym,
+            'shares': pos['shares'],
+            'buy_price': pos['buy_price'],
+            'currency': currency_of(sym),
+            'date': pos.get('date', '')
+        }
+        for sym, lots in portfolio.items()
+        for pos in lots
+    ]
+    if not rows:
+        return empty_positions()
+    return pd.DataFrame(rows).astype(POSITION_DTYPES)
+
+
+def value_positions(positions, prices, rates_to_eur, eur_usd_rate):
+    """Valorise toutes les positions en un seul passage vectorisé
+
+    `prices` est une Series symbole -> dernier cours (devise de cotation),
+    `rates_to_eur` un dict devise -> taux de conversion vers l'euro.
+    Les positions sans cours connu ont un cours NaN et sont exclues des totaux.
+    """
+    current = positions['symbol'].map(prices).to_numpy(dtype=np.float64)
+    shares = positions['shares'].to_numpy(dtype=np.float64)
+    cost = shares * positions['buy_price'].to_numpy(dtype=np.float64)
+    value = shares * current
+    profit = value - cost
+
+    to_eur = positions['currency'].map(rates_to_eur).to_numpy(dtype=np.float64)
+
+    valued = positions.copy()
+    valued['current'] = current
+    valued['cost'] = cost
+    valued['value'] = value
+    valued['profit'] = profit
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valued['profit_pct'] = np.where(cost > 0, profit / cost * 100, 0.0)
+    valued['cost_eur'] = cost * to_eur
+    valued['value_eur'] = value * to_eur
+    valued['cost_usd'] = valued['cost_eur'] * eur_usd_rate
+    valued['value_usd'] = valued['value_eur'] * eur_usd_rate
+    return valued
+
+
+def portfolio_totals(valued):
+    """Totaux EUR/USD (valeur, coût, profit, profit %) des positions cotées"""
+    priced = valued[valued['current'].notna()]
+    totals = {}
+    for cur in ('eur', 'usd'):
+        value = float(priced[f'value_{cur}'].sum())
+        cost = float(priced[f'cost_{cur}'].sum())
+        profit = value - cost
+        totals[cur] = {
+            'value': value,
+            'cost': cost,
+            'profit': profit,
+            'profit_pct': (profit / cost * 100) if cost > 0 else 0.0
+        }
+    return totals
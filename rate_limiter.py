@@ -0,0 +1,111 @@
+"""Limiteur de débit global (token bucket) pour toutes les requêtes envoyées à Yahoo Finance"""
+import threading
+import time
+
+from yfinance.exceptions import YFRateLimitError
+
+
+class RateLimitTimeout(Exception):
+    """Aucun jeton disponible dans le délai imparti"""
+
+
+def is_rate_limit_error(exc):
+    """Indique si une exception correspond à une réponse HTTP 429 de Yahoo"""
+    if isinstance(exc, (YFRateLimitError, RateLimitTimeout)):
+        return True
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'status_code', None) == 429
+
+
+class TokenBucketLimiter:
+    """Token bucket à débit adaptatif (AIMD)
+
+    Chaque requête consomme un jeton; les jetons se régénèrent à `rate` par seconde,
+    dans la limite de `burst`. Une réponse 429 divise le débit par deux et vide le
+    seau; chaque succès le remonte ensuite de `recovery_step` jusqu'à `max_rate`.
+    """
+
+    def __init__(self, max_rate=2.0, burst=10, min_rate=0.05, recovery_step=0.05, backoff_factor=0.5):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.recovery_step = recovery_step
+        self.backoff_factor = backoff_factor
+        self.rate = max_rate
+        self.tokens = float(burst)
+        self.waiting = 0
+        self.total_requests = 0
+        self.rate_limited_count = 0
+        self._last_refill = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, timeout=None):
+        """Attend un jeton; lève RateLimitTimeout si `timeout` secondes s'écoulent avant"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.total_requests += 1
+                        return
+                    delay = (1 - self.tokens) / self.rate
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise RateLimitTimeout("Budget de requêtes Yahoo épuisé")
+                        delay = min(delay, remaining)
+                    self._cond.wait(delay)
+            finally:
+                self.waiting -= 1
+
+    def report_success(self):
+        """Augmentation additive du débit après une requête réussie"""
+        with self._cond:
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+    def report_rate_limited(self):
+        """Diminution multiplicative du débit après une réponse 429"""
+        with self._cond:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            self.tokens = 0.0
+            self.rate_limited_count += 1
+
+    def call(self, fn, *args, timeout=None, **kwargs):
+        """Exécute fn(*args, **kwargs) après avoir obtenu un jeton et ajuste le débit"""
+        self.acquire(timeout)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.report_rate_limited()
+            raise
+        self.report_success()
+        return result
+
+    def stats(self):
+        """Budget courant: débit, jetons disponibles, file d'attente et nombre de 429"""
+        with self._cond:
+            self._refill()
+            return {
+                'rate': self.rate,
+                'max_rate': self.max_rate,
+                'tokens': self.tokens,
+                'burst': self.burst,
+                'queue_depth': self.waiting,
+                'total_requests': self.total_requests,
+                'rate_limited': self.rate_limited_count
+            }
+
+
+# Limiteur unique partagé par tout le processus (toutes les sessions Streamlit).
+# Une requête par symbole: la rafale couvre le premier chargement d'une watchlist complète
+yahoo_limiter = TokenBucketLimiter(burst=40)